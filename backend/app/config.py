@@ -13,6 +13,9 @@ class Settings:
     WIKIPEDIA_API = "https://en.wikipedia.org/w/api.php"
     NEWS_API = "https://newsapi.org/v2/everything"
     
+    # Offline title index built with `python -m app.services.wikipedia_index`
+    WIKIPEDIA_INDEX_PATH = os.getenv("WIKIPEDIA_INDEX_PATH")
+    
     # OpenAI Settings
     OPENAI_MODEL = "gpt-3.5-turbo"
     MAX_TOKENS = 1500
@@ -20,12 +23,54 @@ class Settings:
     
     # App Settings
     MAX_SOURCES = 5
+    MAX_PASSAGES = 3  # Wikipedia passages per query in passage retrieval
+    PASSAGE_CHARS = 600
     REQUEST_TIMEOUT = 30
     CACHE_TTL = 3600  # 1 hour
     
+    # Pipelined orchestration
+    PIPELINE_MIN_SOURCES = int(os.getenv("PIPELINE_MIN_SOURCES", 2))
+    PIPELINE_SOURCE_DEADLINE = float(os.getenv("PIPELINE_SOURCE_DEADLINE", 2.0))  # seconds
+    # Speculative mode restarts only if a late source ranks among this many most relevant
+    PIPELINE_RESTART_TOP_N = int(os.getenv("PIPELINE_RESTART_TOP_N", 1))
+    
+    # Tracing
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.1))
+    TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")  # OTLP/JSON lines file
+    TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT")  # e.g. http://localhost:4318
+    
+    # On-demand profiling (disabled unless a token is set)
+    PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+    PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", 300))
+    
+    # Concurrent requests past which the API answers 429
+    REQUEST_LIMIT = int(os.getenv("REQUEST_LIMIT", 10))
+    
+    # Adaptive load shedding targets; in-flight pressure reaches reject at 1.5x
+    # LOAD_MAX_IN_FLIGHT, so the default keeps that under REQUEST_LIMIT
+    LOAD_MAX_IN_FLIGHT = int(os.getenv("LOAD_MAX_IN_FLIGHT", max(REQUEST_LIMIT * 2 // 3, 1)))
+    LOAD_MAX_LOOP_LAG = float(os.getenv("LOAD_MAX_LOOP_LAG", 0.2))  # seconds
+    LOAD_TARGET_UPSTREAM_LATENCY = float(os.getenv("LOAD_TARGET_UPSTREAM_LATENCY", 5.0))
+    LOAD_TARGET_LLM_LATENCY = float(os.getenv("LOAD_TARGET_LLM_LATENCY", 10.0))
+    LOAD_LATENCY_DECAY = 30.0  # seconds for an old latency reading to fade
+    
+    # Conversation sessions
+    SESSION_TTL = int(os.getenv("SESSION_TTL", 1800))  # idle seconds before a session expires
+    SESSION_MAX = int(os.getenv("SESSION_MAX", 500))
+    SESSION_MAX_SOURCES = 20
+    SESSION_HISTORY_TURNS = 3
+    SESSION_RELEVANCE_THRESHOLD = float(os.getenv("SESSION_RELEVANCE_THRESHOLD", 0.5))
+    
     # Rate Limiting
     REQUESTS_PER_MINUTE = 10
     
+    # NewsAPI batching and quota budgeting
+    NEWS_BATCH_WINDOW = float(os.getenv("NEWS_BATCH_WINDOW", 0.05))  # seconds
+    NEWS_BATCH_MAX_QUERIES = int(os.getenv("NEWS_BATCH_MAX_QUERIES", 5))
+    NEWS_DAILY_QUOTA = int(os.getenv("NEWS_DAILY_QUOTA", 100))  # Developer plan
+    NEWS_MINUTE_QUOTA = int(os.getenv("NEWS_MINUTE_QUOTA", 0))  # 0 = no per-minute limit
+    NEWS_QUOTA_RESERVE = int(os.getenv("NEWS_QUOTA_RESERVE", 10))
+    
     @property
     def is_production(self):
         """Check if running in production environment"""
@@ -1,10 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from .routes import research
+from .routes import research, sessions, debug
+import asyncio
 import os
 from pathlib import Path
 from .config import settings
+from .utils.load_shedding import load_controller
 
 app = FastAPI(
     title="Universal Research Assistant API",
@@ -34,6 +36,8 @@ app.add_middleware(
 
 # ✅ CRITICAL FIX: Include API routes FIRST before static files
 app.include_router(research.router)
+app.include_router(sessions.router)
+app.include_router(debug.router)
 
 # ✅ Then serve frontend static files in production (with prefix to avoid conflicts)
 if settings.is_production:
@@ -84,6 +88,9 @@ async def startup_event():
     print(f"📰 NewsAPI configured: {bool(settings.NEWS_API_KEY)}")
     print(f"📝 Total routes registered: {len(app.routes)}")
     
+    # Event-loop lag is one of the load shedding signals
+    asyncio.create_task(load_controller.monitor_event_loop())
+    
     if settings.is_production:
         current_file = Path(__file__).resolve()
         project_root = current_file.parent.parent.parent
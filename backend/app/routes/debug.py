@@ -0,0 +1,65 @@
+import asyncio
+import hmac
+import threading
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from ..config import settings
+from ..utils.profiler import profiler
+
+def require_profiling_token(x_profiling_token: Optional[str] = Header(None)):
+    """Profiling is opt-in: hidden unless PROFILING_TOKEN is set, and guarded by it"""
+    if not settings.PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_profiling_token or not hmac.compare_digest(x_profiling_token, settings.PROFILING_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid profiling token")
+
+router = APIRouter(
+    prefix="/debug/profile",
+    tags=["debug"],
+    dependencies=[Depends(require_profiling_token)]
+)
+
+@router.post("/start")
+async def start_profile(
+    duration: Optional[float] = Query(None, gt=0, description="Seconds to profile"),
+    requests: Optional[int] = Query(None, gt=0, description="Profile the next N research requests"),
+    interval_ms: float = Query(5.0, ge=1, le=1000, description="Sampling interval")
+):
+    """
+    Start sampling stacks of every worker thread.
+    
+    Give **duration** for a time window or **requests** to cover the next N research
+    requests (bounded by PROFILING_MAX_SECONDS either way).
+    """
+    try:
+        # Async endpoints run on the event loop thread, so this identifies it
+        return profiler.start(
+            duration=duration,
+            requests=requests,
+            interval=interval_ms / 1000,
+            loop_thread_id=threading.get_ident()
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.post("/stop")
+async def stop_profile():
+    """Stop the running profile early"""
+    # stop() joins the sampler thread; keep that wait off the event loop
+    return await asyncio.to_thread(profiler.stop)
+
+@router.get("")
+async def get_profile(
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    limit: int = Query(25, ge=1, le=200)
+):
+    """
+    Profile results.
+    
+    - **json**: status, event-loop busy percentage, top functions and collapsed stacks
+    - **collapsed**: plain collapsed-stack text for flamegraph.pl or speedscope
+    """
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed())
+    return profiler.report(limit)
@@ -1,16 +1,23 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request, Response
 from fastapi.responses import JSONResponse
 import time
-from ..schemas.request import ResearchRequest, ResearchDepth
-from ..schemas.response import ResearchResponse, HealthResponse
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+from ..schemas.request import ResearchRequest, ResearchDepth, ResponseView
+from ..schemas.response import ResearchResponse, HealthResponse, Source
 from ..services.research_service import research_service
+from ..services.news_service import news_service
+from ..services.session_service import session_service
 from ..config import settings
+from ..utils.tracing import tracer, trace_context_from_headers
+from ..utils.profiler import profiler
+from ..utils.load_shedding import load_controller
 
 router = APIRouter(prefix="/api/v1", tags=["research"])
 
 # Simple rate limiting (in-memory)
 active_requests = {}
-REQUEST_LIMIT = 10
+REQUEST_LIMIT = settings.REQUEST_LIMIT
 startup_time = time.time()
 
 @router.get("/health", response_model=HealthResponse)
@@ -29,7 +36,9 @@ async def health_check():
 @router.post("/research", response_model=ResearchResponse)
 async def research_endpoint(
     request: ResearchRequest,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    response: Response
 ):
     """
     Main research endpoint.
@@ -38,69 +47,149 @@ async def research_endpoint(
     - **depth**: quick, balanced, or deep
     - **include_sources**: Which sources to use (wikipedia, news)
     - **max_sources**: Maximum number of sources to return
+    - **retrieval**: intro (article intros) or passages (most relevant article passages)
+    - **pipelined**: Start generating once enough sources have arrived
+    - **speculative**: With pipelined, restart generation if late sources change the set
+    - **view**: full, citations (sources without content) or answer (no sources)
+    - **fields**: Only return these top-level fields, e.g. ["answer", "sources"]
+    
+    Full source content for compact views is available from `GET /api/v1/sources/{id}`.
+    The trace id of the request is returned in the `X-Trace-Id` header.
+    """
+    with tracer.span(
+        "research_endpoint",
+        **trace_context_from_headers(http_request.headers),
+        query_length=len(request.query),
+        depth=request.depth.value
+    ) as span:
+        response.headers["X-Trace-Id"] = span.trace_id
+        profile_token = profiler.request_started()
+        load_controller.request_started()
+        try:
+            result = await _run_research(request)
+            if request.view == ResponseView.FULL and not request.fields:
+                return result
+            return JSONResponse(
+                content=result.shaped(request.view.value, request.fields),
+                headers={"X-Trace-Id": span.trace_id}
+            )
+        except HTTPException as e:
+            span.set(status_code=e.status_code)
+            e.headers = {**(e.headers or {}), "X-Trace-Id": span.trace_id}
+            raise
+        finally:
+            profiler.request_finished(profile_token)
+            load_controller.request_finished()
+
+@contextmanager
+def rate_limited(client_ip: str = "demo"):
+    """Count a request against REQUEST_LIMIT while it runs; raises 429 past the limit"""
+    # In production: request.client.host
+    if active_requests.get(client_ip, 0) >= REQUEST_LIMIT:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests. Please try again in a moment."
+        )
+    active_requests[client_ip] = active_requests.get(client_ip, 0) + 1
+    try:
+        yield
+    finally:
+        # Clean up rate limiting
+        active_requests[client_ip] -= 1
+        if active_requests[client_ip] <= 0:
+            del active_requests[client_ip]
+
+def plan_research(depth: ResearchDepth, balanced_sources: int) -> Tuple[Dict, List[str], int]:
+    """Load-shedding plan, providers and source count for a request of this depth.
+
+    Raises 503 when the plan rejects the request. ``balanced_sources`` is the
+    source count of a balanced request, before the plan's cap.
     """
+    # Degrade before rejecting when the server is under pressure
+    plan = load_controller.plan(depth.value)
+    if plan["level"] == "reject":
+        raise HTTPException(
+            status_code=503,
+            detail="Server is overloaded. Please try again in a moment.",
+            headers={"Retry-After": "5"}
+        )
+    depth = ResearchDepth(plan["depth"])
     
-    # Simple rate limiting
-    client_ip = "demo"  # In production: request.client.host
+    # Adjust parameters based on depth
+    if depth == ResearchDepth.QUICK:
+        max_sources = 3
+        include_sources = ["wikipedia"]  # Quick mode: Wikipedia only
+    elif depth == ResearchDepth.DEEP:
+        max_sources = 8
+        include_sources = ["wikipedia", "news"]  # Deep mode: All sources
+    else:  # balanced
+        max_sources = balanced_sources
+        include_sources = ["wikipedia", "news"]  # Balanced: Both sources
     
-    if client_ip in active_requests:
-        if active_requests[client_ip] >= REQUEST_LIMIT:
-            raise HTTPException(
-                status_code=429,
-                detail="Too many requests. Please try again in a moment."
-            )
-        active_requests[client_ip] += 1
-    else:
-        active_requests[client_ip] = 1
+    if plan["max_sources"]:
+        max_sources = min(max_sources, plan["max_sources"])
     
-    try:
-        # Validate query
-        if not request.query or len(request.query.strip()) < 3:
-            raise HTTPException(
-                status_code=400,
-                detail="Query must be at least 3 characters long"
+    return plan, include_sources, max_sources
+
+async def _run_research(request: ResearchRequest) -> ResearchResponse:
+    with rate_limited():
+        try:
+            # Validate query
+            if not request.query or len(request.query.strip()) < 3:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Query must be at least 3 characters long"
+                )
+            
+            if len(request.query) > 500:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Query too long. Maximum 500 characters."
+                )
+            
+            unknown_fields = set(request.fields or []) - set(ResearchResponse.model_fields)
+            if unknown_fields:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown fields: {', '.join(sorted(unknown_fields))}"
+                )
+            
+            plan, include_sources, max_sources = plan_research(request.depth, request.max_sources or 5)
+            
+            # Perform research
+            result = await research_service.research(
+                query=request.query.strip(),
+                include_sources=include_sources,
+                max_sources=max_sources,
+                retrieval=request.retrieval.value,
+                # Cache lookups gain nothing from pipelining
+                pipelined=request.pipelined and not plan["cache_only"],
+                speculative=request.speculative,
+                max_tokens=plan["max_tokens"],
+                cache_only=plan["cache_only"]
             )
-        
-        if len(request.query) > 500:
+            
+            if plan["level"] != "normal":
+                result.degradation = plan
+            
+            return result
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Research endpoint error: {str(e)}")
             raise HTTPException(
-                status_code=400,
-                detail="Query too long. Maximum 500 characters."
+                status_code=500,
+                detail=f"Research failed: {str(e)[:100]}"
             )
-        
-        # Adjust parameters based on depth
-        if request.depth == ResearchDepth.QUICK:
-            max_sources = 3
-            include_sources = ["wikipedia"]  # Quick mode: Wikipedia only
-        elif request.depth == ResearchDepth.DEEP:
-            max_sources = 8
-            include_sources = ["wikipedia", "news"]  # Deep mode: All sources
-        else:  # balanced
-            max_sources = request.max_sources or 5
-            include_sources = ["wikipedia", "news"]  # Balanced: Both sources
-        
-        # Perform research
-        result = await research_service.research(
-            query=request.query.strip(),
-            include_sources=include_sources,
-            max_sources=max_sources
-        )
-        
-        return result
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Research endpoint error: {str(e)}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Research failed: {str(e)[:100]}"
-        )
-    finally:
-        # Clean up rate limiting
-        if client_ip in active_requests:
-            active_requests[client_ip] -= 1
-            if active_requests[client_ip] <= 0:
-                del active_requests[client_ip]
+
+@router.get("/sources/{source_id}", response_model=Source)
+async def get_source(source_id: str):
+    """Full content and metadata of a source returned by an earlier response"""
+    source = research_service.get_source(source_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Source not found or expired")
+    return source
 
 @router.options("/research")
 async def research_options():
@@ -126,7 +215,9 @@ async def test_endpoint():
             "POST /api/v1/research": "Main research endpoint",
             "GET /api/v1/health": "Health check",
             "GET /api/v1/test": "This endpoint",
-            "GET /api/v1/stats": "Usage statistics"
+            "GET /api/v1/stats": "Usage statistics",
+            "POST /api/v1/sessions": "Start a multi-turn research session",
+            "GET /api/v1/sources/{id}": "Full content of a returned source"
         },
         "available_sources": ["wikipedia", "news"],
         "environment": "production" if settings.is_production else "development"
@@ -139,5 +230,8 @@ async def get_stats():
         "active_requests": len(active_requests),
         "total_requests_handled": sum(active_requests.values()),
         "uptime_seconds": time.time() - startup_time,
-        "rate_limit": REQUEST_LIMIT
+        "rate_limit": REQUEST_LIMIT,
+        "news": news_service.stats(),
+        "load": load_controller.stats(),
+        "sessions": session_service.stats()
     }
\ No newline at end of file
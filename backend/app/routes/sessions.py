@@ -0,0 +1,94 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from ..schemas.request import SessionQuery, ResponseView
+from ..schemas.response import SessionResearchResponse, SessionResponse, SessionTurn
+from ..services.session_service import session_service
+from ..config import settings
+from ..utils.load_shedding import load_controller
+from ..utils.profiler import profiler
+from .research import rate_limited, plan_research
+
+router = APIRouter(prefix="/api/v1/sessions", tags=["sessions"])
+
+def _get_session(session_id: str):
+    session = session_service.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session
+
+def _session_response(session) -> SessionResponse:
+    return SessionResponse(
+        session_id=session["id"],
+        created=session["created"],
+        turns=[SessionTurn(**turn) for turn in session["turns"]],
+        source_count=len(session["sources"])
+    )
+
+@router.post("", response_model=SessionResponse)
+async def create_session():
+    """Start a research session; ask questions with POST /api/v1/sessions/{session_id}/research"""
+    return _session_response(session_service.create())
+
+@router.get("/{session_id}", response_model=SessionResponse)
+async def get_session(session_id: str):
+    """Turns asked so far and the number of sources the session holds"""
+    return _session_response(_get_session(session_id))
+
+@router.delete("/{session_id}")
+async def delete_session(session_id: str):
+    """End a session and drop its sources"""
+    if not session_service.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"deleted": session_id}
+
+@router.post("/{session_id}/research", response_model=SessionResearchResponse)
+async def session_research(session_id: str, request: SessionQuery):
+    """
+    Ask a question within a session.
+    
+    Follow-ups are answered from the sources the session already retrieved; new
+    sources are fetched only when those no longer cover the question.
+    Sessions expire after SESSION_TTL seconds without a question.
+    Under load, turns are degraded or rejected as for POST /api/v1/research and
+    the applied plan is returned in **degradation**.
+    **view** and **fields** shape the response as for POST /api/v1/research.
+    """
+    session = _get_session(session_id)
+    
+    query = request.query.strip()
+    if len(query) < 3:
+        raise HTTPException(status_code=400, detail="Query must be at least 3 characters long")
+    if len(query) > 500:
+        raise HTTPException(status_code=400, detail="Query too long. Maximum 500 characters.")
+    unknown_fields = set(request.fields or []) - set(SessionResearchResponse.model_fields)
+    if unknown_fields:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown_fields))}")
+    
+    profile_token = profiler.request_started()
+    load_controller.request_started()
+    try:
+        with rate_limited():
+            # Follow-ups shed load like one-off research requests
+            plan, include_sources, max_sources = plan_research(
+                request.depth, request.max_sources or settings.MAX_SOURCES
+            )
+            result = await session_service.ask(
+                session, query, include_sources, max_sources,
+                max_tokens=plan["max_tokens"], cache_only=plan["cache_only"]
+            )
+        if plan["level"] != "normal":
+            result.degradation = plan
+        if request.view == ResponseView.FULL and not request.fields:
+            return result
+        return JSONResponse(content=result.shaped(request.view.value, request.fields))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Session research error: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Research failed: {str(e)[:100]}"
+        )
+    finally:
+        profiler.request_finished(profile_token)
+        load_controller.request_finished()
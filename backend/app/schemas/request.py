@@ -8,11 +8,25 @@ class ResearchDepth(str, Enum):
     BALANCED = "balanced"
     DEEP = "deep"
 
+class RetrievalMode(str, Enum):
+    INTRO = "intro"
+    PASSAGES = "passages"
+
+class ResponseView(str, Enum):
+    FULL = "full"
+    CITATIONS = "citations"
+    ANSWER = "answer"
+
 class ResearchRequest(BaseModel):
     query: str
     depth: ResearchDepth = ResearchDepth.BALANCED
     include_sources: List[str] = ["wikipedia", "arxiv", "news"]
     max_sources: int = 5
+    retrieval: RetrievalMode = RetrievalMode.INTRO
+    pipelined: bool = False
+    speculative: bool = False
+    view: ResponseView = ResponseView.FULL
+    fields: Optional[List[str]] = None
     
     class Config:
         json_schema_extra = {
@@ -22,4 +36,20 @@ class ResearchRequest(BaseModel):
                 "include_sources": ["wikipedia", "arxiv", "news"],
                 "max_sources": 5
             }
+        }
+
+class SessionQuery(BaseModel):
+    query: str
+    depth: ResearchDepth = ResearchDepth.BALANCED
+    max_sources: int = 5
+    view: ResponseView = ResponseView.FULL
+    fields: Optional[List[str]] = None
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "query": "And what about its history?",
+                "depth": "balanced",
+                "max_sources": 5
+            }
         }
\ No newline at end of file
@@ -4,6 +4,7 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 class Source(BaseModel):
+    id: Optional[str] = None
     title: str
     content: str
     url: str
@@ -18,6 +19,29 @@ class ResearchResponse(BaseModel):
     tokens_used: int
     processing_time: float
     timestamp: datetime
+    pipeline: Optional[Dict[str, Any]] = None
+    degradation: Optional[Dict[str, Any]] = None
+    
+    def shaped(self, view: str = "full", fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """JSON-ready payload for a response view, optionally limited to some top-level fields.
+        
+        - full: every source with content and metadata
+        - citations: sources reduced to id, title, url and source_type
+        - answer: no sources at all
+        
+        Full source content stays available from GET /api/v1/sources/{id}.
+        """
+        payload = self.model_dump(mode="json", exclude_none=True)
+        if view == "answer":
+            payload.pop("sources", None)
+        elif view == "citations":
+            payload["sources"] = [
+                {key: source[key] for key in ("id", "title", "url", "source_type") if key in source}
+                for source in payload.get("sources", [])
+            ]
+        if fields:
+            payload = {key: value for key, value in payload.items() if key in fields}
+        return payload
     
     class Config:
         json_schema_extra = {
@@ -25,6 +49,7 @@ class ResearchResponse(BaseModel):
                 "answer": "Artificial intelligence (AI) is...",
                 "sources": [
                     {
+                        "id": "3f1c2a9e8b7d6c5a",
                         "title": "Artificial intelligence",
                         "content": "AI is the simulation...",
                         "url": "https://en.wikipedia.org/wiki/AI",
@@ -38,6 +63,23 @@ class ResearchResponse(BaseModel):
             }
         }
 
+class SessionResearchResponse(ResearchResponse):
+    session_id: str
+    turn: int
+    fetched_new_sources: bool
+
+class SessionTurn(BaseModel):
+    query: str
+    answer: str
+    source_urls: List[str]
+    timestamp: datetime
+
+class SessionResponse(BaseModel):
+    session_id: str
+    created: datetime
+    turns: List[SessionTurn]
+    source_count: int
+
 class HealthResponse(BaseModel):
     status: str
     version: str
@@ -2,6 +2,7 @@ from openai import OpenAI
 from typing import List, Dict
 import json
 from ..config import settings
+from ..utils.tracing import tracer
 
 class AIService:
     def __init__(self):
@@ -10,8 +11,13 @@ class AIService:
         self.max_tokens = settings.MAX_TOKENS
         self.temperature = settings.TEMPERATURE
     
-    def generate_answer(self, query: str, sources: List[Dict]) -> Dict:
-        """Generate comprehensive answer from sources"""
+    def generate_answer(self, query: str, sources: List[Dict], max_tokens: int = None,
+                        history: List[Dict] = None) -> Dict:
+        """Generate comprehensive answer from sources.
+        
+        ``history`` holds earlier turns of a session (``query``/``answer`` dicts) and is
+        sent as prior conversation so follow-up questions can refer back to it.
+        """
         
         if not sources:
             return {
@@ -38,32 +44,53 @@ AVAILABLE SOURCES:
 
 Please provide a well-researched answer with proper citations:"""
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                stream=False
-            )
+        with tracer.span(
+            "openai.chat",
+            model=self.model,
+            sources=len(sources),
+            prompt_chars=len(system_prompt) + len(user_prompt),
+            history_turns=len(history or [])
+        ) as span:
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        *self._format_history(history or []),
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    max_tokens=max_tokens or self.max_tokens,
+                    temperature=self.temperature,
+                    stream=False
+                )
             
-            answer = response.choices[0].message.content
-            tokens_used = response.usage.total_tokens
+                answer = response.choices[0].message.content
+                tokens_used = response.usage.total_tokens
+                span.set(tokens_used=tokens_used, answer_chars=len(answer or ""))
             
-            return {
-                "answer": answer,
-                "tokens_used": tokens_used
-            }
+                return {
+                    "answer": answer,
+                    "tokens_used": tokens_used
+                }
             
-        except Exception as e:
-            print(f"OpenAI service error: {e}")
-            return {
-                "answer": f"I encountered an error while generating the answer. Please try again. Error: {str(e)[:100]}",
-                "tokens_used": 0
-            }
+            except Exception as e:
+                print(f"OpenAI service error: {e}")
+                span.record_error(e)
+                return {
+                    "answer": f"I encountered an error while generating the answer. Please try again. Error: {str(e)[:100]}",
+                    "tokens_used": 0
+                }
+    
+    def _format_history(self, history: List[Dict]) -> List[Dict]:
+        """Earlier turns as chat messages; answers are trimmed to keep the prompt small"""
+        messages = []
+        for turn in history:
+            answer = turn.get('answer', '')
+            if len(answer) > 600:
+                answer = answer[:600] + "..."
+            messages.append({"role": "user", "content": turn.get('query', '')})
+            messages.append({"role": "assistant", "content": answer})
+        return messages
     
     def _format_sources(self, sources: List[Dict]) -> str:
         """Format sources for the prompt"""
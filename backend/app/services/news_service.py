@@ -1,74 +1,364 @@
+import re
+import threading
+import time
 import requests
+from collections import deque
+from email.utils import parsedate_to_datetime
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from ..config import settings
+from ..utils.cache import TTLCache
+from ..utils.tracing import tracer
+
+# NewsAPI rejects `q` values longer than this
+MAX_QUERY_LENGTH = 500
+
+STOPWORDS = {
+    "the", "and", "for", "with", "what", "who", "why", "how", "when", "where",
+    "which", "are", "was", "were", "is", "its", "about", "from", "into", "does"
+}
+
+class NewsQuota:
+    """Tracks the NewsAPI request budget and any Retry-After back-off"""
+
+    def __init__(self, daily_limit: int, minute_limit: int = 0):
+        self.daily_limit = daily_limit
+        self.minute_limit = minute_limit
+        self.blocked_until = 0.0
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        while self._calls and now - self._calls[0] > 86400:
+            self._calls.popleft()
+
+    def record_call(self):
+        with self._lock:
+            now = time.time()
+            self._prune(now)
+            self._calls.append(now)
+
+    def record_rate_limited(self, retry_after: Optional[str]):
+        """Back off until the time given by a 429's Retry-After header"""
+        delay = 60.0
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    pass
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.time() + max(delay, 0))
+
+    def remaining(self) -> Dict[str, Optional[int]]:
+        with self._lock:
+            now = time.time()
+            self._prune(now)
+            minute_calls = sum(1 for t in self._calls if now - t <= 60)
+            return {
+                "daily": max(self.daily_limit - len(self._calls), 0),
+                "minute": max(self.minute_limit - minute_calls, 0) if self.minute_limit else None
+            }
+
+    def is_blocked(self) -> bool:
+        """True when no upstream call may be made right now"""
+        if time.time() < self.blocked_until:
+            return True
+        remaining = self.remaining()
+        return remaining["daily"] <= 0 or remaining["minute"] == 0
+
+    def is_low(self) -> bool:
+        """True when the daily budget has dropped into the reserve"""
+        return self.is_blocked() or self.remaining()["daily"] <= settings.NEWS_QUOTA_RESERVE
+
+
+class _PendingQuery:
+    def __init__(self, query: str, max_results: int):
+        self.query = query
+        self.max_results = max_results
+        self.results = None
+        self.lead = False
+        self.done = threading.Event()
+
 
 class NewsService:
     def __init__(self):
         self.api_key = settings.NEWS_API_KEY
         self.base_url = settings.NEWS_API
-    
-    def search(self, query: str, max_results: int = 3) -> List[Dict]:
-        """Search for news articles"""
+        self.quota = NewsQuota(settings.NEWS_DAILY_QUOTA, settings.NEWS_MINUTE_QUOTA)
+        self.cache = TTLCache(max_entries=512, ttl=settings.CACHE_TTL)
+        self.stats_counters = {"queries": 0, "upstream_calls": 0, "cache_hits": 0, "degraded": 0}
+        self._pending = []
+        self._leader_active = False
+        self._lock = threading.Lock()
+
+    def search(self, query: str, max_results: int = 3, cache_only: bool = False) -> List[Dict]:
+        """Search for news articles.
+
+        Queries arriving within NEWS_BATCH_WINDOW of each other are sent to NewsAPI as one
+        combined OR query and the articles are split back out by relevance. When the quota
+        is low, cached results (even stale ones) are served instead of spending a request.
+        With ``cache_only`` NewsAPI is never called.
+        """
+        with tracer.span("news.search", query_length=len(query), max_results=max_results) as span:
+            results = self._search(query, max_results, cache_only)
+            span.set(results=len(results))
+            return results
+
+    def _search(self, query: str, max_results: int, cache_only: bool) -> List[Dict]:
+        span = tracer.current_span()
         if not self.api_key:
             print("NewsAPI key not configured")
             return []
-        
+
+        key = self._cache_key(query)
+        self.stats_counters["queries"] += 1
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.stats_counters["cache_hits"] += 1
+            span.set(cache="hit")
+            return cached[:max_results]
+
+        if cache_only:
+            span.set(cache="stale-or-miss", cache_only=True)
+            return (self.cache.get(key, allow_stale=True) or [])[:max_results]
+
+        if self.quota.is_low():
+            stale = self.cache.get(key, allow_stale=True)
+            if stale is not None or self.quota.is_blocked():
+                print("NewsAPI quota low, serving cached results")
+                self.stats_counters["degraded"] += 1
+                span.set(cache="stale" if stale is not None else "miss", degraded=True)
+                return (stale or [])[:max_results]
+
+        entry = _PendingQuery(query.strip(), max_results)
+        with self._lock:
+            self._pending.append(entry)
+            lead = not self._leader_active
+            self._leader_active = True
+
+        span.set(batch_leader=lead)
+        if lead:
+            time.sleep(settings.NEWS_BATCH_WINDOW)
+            self._lead_batch()
+
+        deadline = time.time() + settings.REQUEST_TIMEOUT
+        while True:
+            signalled = entry.done.wait(timeout=max(deadline - time.time(), 0))
+            with self._lock:
+                if signalled and not entry.lead:
+                    return (entry.results or [])[:max_results]
+                if not signalled:
+                    # Leave the queue so no leader hands the next batch to a waiter that is gone
+                    if entry in self._pending:
+                        self._pending.remove(entry)
+                        if entry.lead:
+                            self._hand_off()
+                    print("News service error: timed out waiting for batched request")
+                    span.record_error("timed out waiting for batched request")
+                    return []
+                # The previous leader handed this query the next batch
+                entry.lead = False
+                entry.done.clear()
+            self._lead_batch()
+
+    def stats(self) -> Dict:
+        """Quota and batching counters for the stats endpoint"""
+        return {
+            **self.stats_counters,
+            "quota_remaining": self.quota.remaining(),
+            "blocked_for_seconds": round(max(self.quota.blocked_until - time.time(), 0), 1),
+            "cached_queries": len(self.cache)
+        }
+
+    def _lead_batch(self):
+        """Send one batch upstream, then hand leadership to the next waiting query"""
+        with self._lock:
+            batch = []
+            length = 0
+            for entry in list(self._pending):
+                if len(batch) >= settings.NEWS_BATCH_MAX_QUERIES:
+                    break
+                # Each extra query costs its text plus the "(...) OR " wrapping
+                extra = len(entry.query) + (6 if batch else 2)
+                if batch and length + extra > MAX_QUERY_LENGTH:
+                    break
+                batch.append(entry)
+                length += extra
+            for entry in batch:
+                self._pending.remove(entry)
+
         try:
+            self._fetch_batch(batch)
+        finally:
+            with self._lock:
+                self._hand_off()
+            for entry in batch:
+                entry.done.set()
+
+    def _hand_off(self):
+        """Pass leadership to the oldest waiting query; call with the lock held.
         
+        Waiters that time out remove themselves from the queue under the same lock,
+        so every queued entry still has a thread that will run the batch.
+        """
+        if self._pending:
+            successor = self._pending[0]
+            successor.lead = True
+            successor.done.set()
+        else:
+            self._leader_active = False
+
+    def _fetch_batch(self, batch: List[_PendingQuery]):
+        queries = []
+        for entry in batch:
+            if entry.query not in queries:
+                queries.append(entry.query)
+
+        if len(queries) == 1:
+            combined = queries[0]
+            page_size = max(entry.max_results for entry in batch)
+        else:
+            combined = " OR ".join(f"({q})" for q in queries)
+            # Over-fetch so each query still gets its share after demultiplexing
+            page_size = min(sum(entry.max_results for entry in batch) * 2, 100)
+
+        tracer.current_span().set(batch_size=len(batch), batched_queries=len(queries))
+        articles = self._request(combined, page_size)
+        if articles is None:
+            for entry in batch:
+                entry.results = self.cache.get(self._cache_key(entry.query), allow_stale=True) or []
+            return
+
+        by_query = {}
+        for q in queries:
+            if len(queries) == 1:
+                by_query[q] = articles
+            else:
+                by_query[q] = self._demultiplex(q, articles)
+                if not by_query[q]:
+                    # No usable terms ("What is AI?") or crowded out by the other queries
+                    by_query[q] = self._request_alone(q, batch)
+                    if by_query[q] is None:
+                        continue
+            self.cache.set(self._cache_key(q), by_query[q])
+
+        for entry in batch:
+            if entry.query in by_query:
+                entry.results = by_query[entry.query]
+            else:
+                entry.results = self.cache.get(self._cache_key(entry.query), allow_stale=True) or []
+
+    def _request_alone(self, query: str, batch: List[_PendingQuery]) -> Optional[List[Dict]]:
+        """Send a query that got nothing out of a combined response on its own"""
+        page_size = max(entry.max_results for entry in batch if entry.query == query)
+        return self._request(query, page_size)
+
+    def _request(self, q: str, page_size: int) -> Optional[List[Dict]]:
+        """One /v2/everything call; None means the call failed"""
+        if self.quota.is_blocked():
+            print("NewsAPI quota exhausted, skipping request")
+            return None
+
+        try:
+
             from_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-            
+
             params = {
-                "q": query,
+                "q": q,
                 "apiKey": self.api_key,
-                "pageSize": max_results,
+                "pageSize": page_size,
                 "sortBy": "relevancy",
                 "language": "en",
                 "from": from_date
             }
-            
-            response = requests.get(
-                self.base_url, 
-                params=params, 
-                timeout=15
-            )
-            
+
+            self.quota.record_call()
+            self.stats_counters["upstream_calls"] += 1
+            with tracer.span("news.http", page_size=page_size, query_length=len(q)) as span:
+                response = requests.get(
+                    self.base_url,
+                    params=params,
+                    timeout=15
+                )
+                span.record_http(response)
+
             if response.status_code == 200:
                 data = response.json()
                 articles = data.get('articles', [])
-                
+
                 results = []
                 for article in articles:
-                
-                    if (article.get('title') and 
-                        article.get('title') != "[Removed]" and 
-                        article.get('description')):
-                        
-                        content = article.get('description') or article.get('content') or ""
-                        
-                        if content:
-                            content = content.strip()
-                            if len(content) > 250:
-                                content = content[:250] + "..."
-                        
-                        results.append({
-                            "title": article['title'],
-                            "content": content,
-                            "url": article.get('url', '#'),
-                            "source_type": "news",
-                            "metadata": {
-                                "source": article.get('source', {}).get('name', 'Unknown'),
-                                "published": article.get('publishedAt', '')[:10],
-                                "author": article.get('author')
-                            }
-                        })
-                
+                    formatted = self._format_article(article)
+                    if formatted:
+                        results.append(formatted)
+
                 return results
+            elif response.status_code == 429:
+                print("NewsAPI error: rate limited")
+                self.quota.record_rate_limited(response.headers.get("Retry-After"))
+                return None
             else:
                 print(f"NewsAPI error: HTTP {response.status_code}")
-                return []
-                
+                return None
+
         except Exception as e:
             print(f"News service error: {e}")
+            tracer.current_span().record_error(e)
+            return None
+
+    def _format_article(self, article: Dict) -> Optional[Dict]:
+        if not (article.get('title') and
+                article.get('title') != "[Removed]" and
+                article.get('description')):
+            return None
+
+        content = article.get('description') or article.get('content') or ""
+
+        if content:
+            content = content.strip()
+            if len(content) > 250:
+                content = content[:250] + "..."
+
+        return {
+            "title": article['title'],
+            "content": content,
+            "url": article.get('url', '#'),
+            "source_type": "news",
+            "metadata": {
+                "source": (article.get('source') or {}).get('name', 'Unknown'),
+                "published": (article.get('publishedAt') or '')[:10],
+                "author": article.get('author')
+            }
+        }
+
+    def _demultiplex(self, query: str, articles: List[Dict]) -> List[Dict]:
+        """Pick the articles of a combined response that belong to one query"""
+        terms = self._terms(query)
+        if not terms:
             return []
-news_service = NewsService()
\ No newline at end of file
+
+        scored = []
+        for position, article in enumerate(articles):
+            title_terms = self._terms(article['title'])
+            body_terms = self._terms(article['content'])
+            score = sum(2 if t in title_terms else 1 if t in body_terms else 0 for t in terms) / len(terms)
+            if score > 0:
+                # Ties keep NewsAPI's relevancy order
+                scored.append((-score, position, article))
+
+        scored.sort(key=lambda item: (item[0], item[1]))
+        return [article for _, _, article in scored]
+
+    @staticmethod
+    def _terms(text: str) -> set:
+        return {t for t in re.findall(r"[a-z0-9]+", text.lower()) if len(t) > 2 and t not in STOPWORDS}
+
+    @staticmethod
+    def _cache_key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+news_service = NewsService()
@@ -1,12 +1,18 @@
 import asyncio
 import time
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 from ..schemas.response import ResearchResponse, Source
 from .wikipedia_service import wikipedia_service
 # from .arxiv_service import arxiv_service
 from .news_service import news_service
 from .ai_service import ai_service
+from ..config import settings
+from ..utils.cache import TTLCache
+from ..utils.helpers import generate_source_id
+from ..utils.load_shedding import load_controller
+from ..utils.text_ranking import BM25
+from ..utils.tracing import tracer
 
 class ResearchService:
     def __init__(self):
@@ -15,9 +21,33 @@ class ResearchService:
             # "arxiv": arxiv_service,
             "news": news_service
         }
+        # Full sources by id, so compact responses can be expanded on demand
+        self.source_cache = TTLCache(max_entries=2048, ttl=settings.CACHE_TTL)
     
-    async def research(self, query: str, include_sources: List[str] = None, max_sources: int = 5) -> ResearchResponse:
+    async def research(self, query: str, include_sources: List[str] = None, max_sources: int = 5,
+                       pipelined: bool = False, speculative: bool = False,
+                       retrieval: str = "intro", max_tokens: int = None,
+                       cache_only: bool = False) -> ResearchResponse:
         """Main research orchestration function"""
+        with tracer.span(
+            "research",
+            include_sources=include_sources or [],
+            max_sources=max_sources,
+            pipelined=pipelined,
+            retrieval=retrieval,
+            cache_only=cache_only
+        ) as span:
+            result = await self._research(
+                query, include_sources, max_sources,
+                pipelined=pipelined, speculative=speculative, retrieval=retrieval,
+                max_tokens=max_tokens, cache_only=cache_only
+            )
+            span.set(sources=len(result.sources), tokens_used=result.tokens_used)
+            return result
+    
+    async def _research(self, query: str, include_sources: List[str], max_sources: int,
+                        pipelined: bool, speculative: bool, retrieval: str,
+                        max_tokens: int, cache_only: bool) -> ResearchResponse:
         start_time = time.time()
         
         if include_sources is None:
@@ -26,26 +56,93 @@ class ResearchService:
         print(f"🔍 Researching: {query}")
         print(f"📚 Including sources: {include_sources}")
         
+        calls = self._provider_calls(query, include_sources, retrieval, cache_only)
+        
+        if pipelined:
+            final_sources, ai_result, pipeline = await self._research_pipelined(
+                query, calls, max_sources, speculative, max_tokens
+            )
+        else:
+            final_sources = await self._gather(calls, max_sources, record_latency=not cache_only)
+            print(f"✅ Found {len(final_sources)} unique sources")
+            
+            generation_start = time.time()
+            ai_result = ai_service.generate_answer(query, final_sources, max_tokens=max_tokens)
+            load_controller.record_latency("llm", time.time() - generation_start)
+            pipeline = None
+        
+        processing_time = time.time() - start_time
+        
+        return ResearchResponse(
+            answer=ai_result['answer'],
+            sources=self.to_source_objects(final_sources),
+            query=query,
+            tokens_used=ai_result['tokens_used'],
+            processing_time=round(processing_time, 2),
+            timestamp=datetime.now(),
+            pipeline=pipeline
+        )
+    
+    async def fetch_sources(self, query: str, include_sources: List[str], max_sources: int,
+                            retrieval: str = "intro", cache_only: bool = False) -> List[Dict]:
+        """Fetch and merge sources from every requested provider, without generating an answer"""
+        calls = self._provider_calls(query, include_sources, retrieval, cache_only)
+        return await self._gather(calls, max_sources, record_latency=not cache_only)
+    
+    def to_source_objects(self, sources: List[Dict]) -> List[Source]:
+        """Build response sources, giving each a stable id and caching it for GET /sources/{id}"""
+        source_objects = []
+        for src in sources:
+            source_id = generate_source_id(src)
+            self.source_cache.set(source_id, src)
+            source_objects.append(Source(
+                id=source_id,
+                title=src.get('title', 'Unknown'),
+                content=src.get('content', ''),
+                url=src.get('url', '#'),
+                source_type=src.get('source_type', 'unknown'),
+                metadata=src.get('metadata', {})
+            ))
+        return source_objects
+    
+    async def _gather(self, calls: Dict[str, Tuple], max_sources: int, record_latency: bool = True) -> List[Dict]:
+        """Run every provider call and wait for all of them"""
+        start_time = time.time()
+        tasks = [asyncio.to_thread(fn, *args, **kwargs) for fn, args, kwargs in calls.values()]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        if record_latency:
+            load_controller.record_latency("upstream", time.time() - start_time)
+        
+        return self._merge_sources(results, max_sources)
     
-        tasks = []
+    def get_source(self, source_id: str) -> Optional[Source]:
+        """A previously returned source with its full content, while it is still cached"""
+        src = self.source_cache.get(source_id)
+        if src is None:
+            return None
+        return self.to_source_objects([src])[0]
+    
+    def _provider_calls(self, query: str, include_sources: List[str], retrieval: str = "intro",
+                        cache_only: bool = False) -> Dict[str, Tuple]:
+        """Map each requested provider to the blocking call that fetches it"""
+        calls = {}
         
         if "wikipedia" in include_sources:
-            
-            wiki_task = asyncio.to_thread(wikipedia_service.search, query)
-            tasks.append(wiki_task)
+            if retrieval == "passages" and not cache_only:
+                calls["wikipedia"] = (wikipedia_service.search_passages, (query,), {})
+            else:
+                calls["wikipedia"] = (wikipedia_service.search, (query,), {"cache_only": cache_only})
         
         # if "arxiv" in include_sources:
-        #     arxiv_task = arxiv_service.search(query, max_results=2)
-        #     tasks.append(arxiv_task)
+        #     calls["arxiv"] = (arxiv_service.search, (query,), {"max_results": 2})
         
         if "news" in include_sources:
+            calls["news"] = (news_service.search, (query,), {"max_results": 2, "cache_only": cache_only})
         
-            news_task = asyncio.to_thread(news_service.search, query, max_results=2)
-            tasks.append(news_task)
-
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        
+        return calls
+    
+    def _merge_sources(self, results: List, max_sources: int) -> List[Dict]:
+        """Flatten provider results, drop failures and duplicate URLs"""
         all_sources = []
         
         for i, result in enumerate(results):
@@ -67,32 +164,135 @@ class ResearchService:
                 seen_urls.add(source.get('url'))
                 unique_sources.append(source)
         
-        final_sources = unique_sources[:max_sources]
+        return unique_sources[:max_sources]
+    
+    async def _research_pipelined(self, query: str, calls: Dict[str, Tuple], max_sources: int,
+                                  speculative: bool, max_tokens: int = None) -> Tuple[List[Dict], Dict, Dict]:
+        """Start generation as soon as enough sources are in instead of waiting for all of them.
         
-        print(f"✅ Found {len(final_sources)} unique sources")
+        Generation begins once PIPELINE_MIN_SOURCES unique sources have arrived, or once
+        PIPELINE_SOURCE_DEADLINE has passed and at least one has; with none in, it waits
+        for the first up to REQUEST_TIMEOUT. Without ``speculative`` the late providers are
+        left to finish in the background and ignored. With ``speculative`` they are still
+        awaited, and if a late source ranks among the PIPELINE_RESTART_TOP_N most relevant
+        of the final set the early answer is discarded and generation restarts on it.
+        """
+        start_time = time.time()
+        names = list(calls)
+        tasks = {}
+        finished_at = {}
+        for name, (fn, args, kwargs) in calls.items():
+            task = asyncio.create_task(asyncio.to_thread(fn, *args, **kwargs))
+            task.add_done_callback(lambda t, name=name: finished_at.setdefault(name, time.time()))
+            tasks[task] = name
         
-
-        ai_result = ai_service.generate_answer(query, final_sources)
-        processing_time = time.time() - start_time
+        results = {}
         
+        def ordered_results():
+            # Keep the barrier path's provider order regardless of arrival order
+            return [results[name] for name in names if name in results]
         
-        source_objects = []
-        for src in final_sources:
-            source_objects.append(Source(
-                title=src.get('title', 'Unknown'),
-                content=src.get('content', ''),
-                url=src.get('url', '#'),
-                source_type=src.get('source_type', 'unknown'),
-                metadata=src.get('metadata', {})
-            ))
+        def collect(done):
+            for task in done:
+                results[tasks[task]] = task.exception() or task.result()
         
-        return ResearchResponse(
-            answer=ai_result['answer'],
-            sources=source_objects,
-            query=query,
-            tokens_used=ai_result['tokens_used'],
-            processing_time=round(processing_time, 2),
-            timestamp=datetime.now()
+        min_sources = min(settings.PIPELINE_MIN_SOURCES, max_sources)
+        deadline = start_time + settings.PIPELINE_SOURCE_DEADLINE
+        # Past the deadline any source will do, but generation never starts on none
+        give_up = start_time + max(settings.PIPELINE_SOURCE_DEADLINE, settings.REQUEST_TIMEOUT)
+        pending = set(tasks)
+        
+        while pending:
+            arrived = len(self._merge_sources(ordered_results(), max_sources))
+            if arrived >= min_sources:
+                break
+            timeout = (deadline if arrived else give_up) - time.time()
+            if timeout <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            collect(done)
+        
+        early_sources = self._merge_sources(ordered_results(), max_sources)
+        waited_for = [name for name in names if name in results]
+        
+        generation_start = time.time()
+        generation = asyncio.create_task(
+            asyncio.to_thread(ai_service.generate_answer, query, early_sources, max_tokens)
         )
+        first_generation_start = generation_start
+        first_generation_end = {}
+        generation.add_done_callback(lambda t: first_generation_end.setdefault("at", time.time()))
+        final_sources = early_sources
+        discarded = None
+        
+        if pending and speculative:
+            done, pending = await asyncio.wait(pending, timeout=settings.REQUEST_TIMEOUT)
+            collect(done)
+            final_sources = self._merge_sources(ordered_results(), max_sources)
+            
+            if self._changes_materially(query, early_sources, final_sources):
+                print("🔁 Late sources changed the source set, restarting generation")
+                # The blocking OpenAI call cannot be interrupted: it keeps running (and
+                # spending tokens) in its worker thread and its answer is dropped
+                discarded = generation
+                discarded.add_done_callback(lambda t: t.cancelled() or t.exception())
+                generation_start = time.time()
+                generation = asyncio.create_task(
+                    asyncio.to_thread(ai_service.generate_answer, query, final_sources, max_tokens)
+                )
+            else:
+                final_sources = early_sources
+        
+        for task in pending:
+            # Late providers finish in a worker thread; retrieve their outcome so it is not reported as lost
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        
+        ai_result = await generation
+        generation_end = time.time()
+        load_controller.record_latency("llm", generation_end - generation_start)
+        if names and len(finished_at) == len(names):
+            load_controller.record_latency("upstream", max(finished_at.values()) - start_time)
+        
+        print(f"✅ Found {len(final_sources)} unique sources (pipelined)")
+        
+        # Overlap is the part of the first generation that ran while providers were still fetching
+        fetch_end = max(finished_at.values(), default=first_generation_start)
+        if len(finished_at) < len(names):
+            fetch_end = generation_end
+        first_end = first_generation_end.get("at", generation_end)
+        overlapped = max(0.0, min(fetch_end, first_end) - first_generation_start)
+        
+        pipeline = {
+            "mode": "speculative" if speculative else "pipelined",
+            "generation_started_after": round(first_generation_start - start_time, 2),
+            "overlapped_seconds": round(overlapped, 2),
+            "providers_awaited": waited_for,
+            "late_providers": [name for name in names if name not in waited_for],
+            "restarted": discarded is not None
+        }
+        if discarded is not None:
+            pipeline["discarded_generation"] = {
+                "started_after": round(first_generation_start - start_time, 2),
+                # Wall time of the dropped call, up to this response if it is still running
+                "wall_seconds": round(first_end - first_generation_start, 2),
+                "finished": discarded.done(),
+                "tokens_used": discarded.result()['tokens_used'] if discarded.done() and not discarded.exception() else None
+            }
+            pipeline["final_generation_started_after"] = round(generation_start - start_time, 2)
+        
+        return final_sources, ai_result, pipeline
+
+    def _changes_materially(self, query: str, early_sources: List[Dict], final_sources: List[Dict]) -> bool:
+        """Whether late sources are worth a second generation: one must rank in the top N by BM25"""
+        early_urls = {src.get('url') for src in early_sources}
+        new = {i for i, src in enumerate(final_sources) if src.get('url') not in early_urls}
+        if not new or not early_sources:
+            return bool(new)
+        
+        top_n = max(settings.PIPELINE_RESTART_TOP_N, 1)
+        ranked = BM25([f"{s.get('title', '')} {s.get('content', '')}" for s in final_sources]).top(query, top_n)
+        # Without any term overlap, fall back to the merge order
+        top = [i for i, _ in ranked] or list(range(min(top_n, len(final_sources))))
+        return any(i in new for i in top)
 
 research_service = ResearchService()
\ No newline at end of file
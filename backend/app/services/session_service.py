@@ -0,0 +1,122 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+from ..config import settings
+from ..schemas.response import SessionResearchResponse
+from ..utils.cache import TTLCache
+from ..utils.load_shedding import load_controller
+from ..utils.text_ranking import BM25, term_coverage
+from ..utils.tracing import tracer
+from .ai_service import ai_service
+from .research_service import research_service
+
+class SessionService:
+    """Multi-turn research sessions that keep their retrieved sources.
+
+    Sessions live in a bounded TTL cache; every turn refreshes the TTL. A
+    follow-up is answered from the session's sources when they cover enough of
+    the question, and only otherwise triggers a new fetch, whose results are
+    merged into the session.
+    """
+
+    def __init__(self):
+        self.store = TTLCache(max_entries=settings.SESSION_MAX, ttl=settings.SESSION_TTL)
+        self.stats_counters = {"turns": 0, "reused": 0, "fetched": 0}
+
+    def create(self) -> Dict:
+        session = {
+            "id": uuid.uuid4().hex,
+            "created": datetime.now(),
+            "sources": [],
+            "turns": [],
+            "lock": asyncio.Lock()
+        }
+        self.store.set(session["id"], session)
+        return session
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        return self.store.get(session_id)
+
+    def delete(self, session_id: str) -> bool:
+        return self.store.pop(session_id) is not None
+
+    async def ask(self, session: Dict, query: str, include_sources: List[str], max_sources: int,
+                  max_tokens: Optional[int] = None, cache_only: bool = False) -> SessionResearchResponse:
+        """Answer a question in a session, reusing its sources when they are relevant.
+
+        ``max_tokens`` and ``cache_only`` come from the load-shedding plan, as for
+        one-off research requests.
+        """
+        async with session["lock"]:
+            with tracer.span("session.ask", turn=len(session["turns"]) + 1) as span:
+                start_time = time.time()
+
+                selected = self._select(session["sources"], query, max_sources)
+                coverage = term_coverage(query, " ".join(f"{s['title']} {s['content']}" for s in selected))
+                fetched = not selected or coverage < settings.SESSION_RELEVANCE_THRESHOLD
+
+                if fetched:
+                    # Follow-ups often lean on the first question for their subject ("its history")
+                    fetch_query = query
+                    if session["turns"]:
+                        fetch_query = f"{session['turns'][0]['query']} {query}"
+                    new_sources = await research_service.fetch_sources(
+                        fetch_query, include_sources, max_sources, cache_only=cache_only
+                    )
+                    self._merge(session, new_sources)
+                    selected = self._select(session["sources"], query, max_sources) or new_sources[:max_sources]
+                    self.stats_counters["fetched"] += 1
+                else:
+                    self.stats_counters["reused"] += 1
+                self.stats_counters["turns"] += 1
+                span.set(coverage=round(coverage, 2), fetched=fetched, sources=len(selected))
+
+                history = session["turns"][-settings.SESSION_HISTORY_TURNS:]
+                generation_start = time.time()
+                ai_result = await asyncio.to_thread(ai_service.generate_answer, query, selected, max_tokens, history)
+                load_controller.record_latency("llm", time.time() - generation_start)
+
+                session["turns"].append({
+                    "query": query,
+                    "answer": ai_result['answer'],
+                    "source_urls": [s.get('url') for s in selected],
+                    "timestamp": datetime.now()
+                })
+                # Storing again refreshes the session's TTL
+                self.store.set(session["id"], session)
+
+                return SessionResearchResponse(
+                    answer=ai_result['answer'],
+                    sources=research_service.to_source_objects(selected),
+                    query=query,
+                    tokens_used=ai_result['tokens_used'],
+                    processing_time=round(time.time() - start_time, 2),
+                    timestamp=datetime.now(),
+                    session_id=session["id"],
+                    turn=len(session["turns"]),
+                    fetched_new_sources=fetched
+                )
+
+    def stats(self) -> Dict:
+        return {**self.stats_counters, "active_sessions": len(self.store)}
+
+    def _select(self, sources: List[Dict], query: str, max_sources: int) -> List[Dict]:
+        """The session's sources most relevant to the query, best first"""
+        if not sources:
+            return []
+        ranked = BM25([f"{s.get('title', '')} {s.get('content', '')}" for s in sources]).top(query, max_sources)
+        return [sources[i] for i, _ in ranked]
+
+    def _merge(self, session: Dict, new_sources: List[Dict]):
+        """Add new sources by URL, dropping the oldest past SESSION_MAX_SOURCES"""
+        known = {s.get('url') for s in session["sources"]}
+        for source in new_sources:
+            if source.get('url') not in known:
+                known.add(source.get('url'))
+                session["sources"].append(source)
+        session["sources"] = session["sources"][-settings.SESSION_MAX_SOURCES:]
+
+
+session_service = SessionService()
@@ -0,0 +1,193 @@
+"""Offline Wikipedia title and redirect index.
+
+The index maps normalized titles (and redirect titles) to page ids so that
+WikipediaService can resolve a query without calling the API. It is a single
+sorted, memory-mapped file:
+
+    magic (8 bytes) | record count (uint64) | record offsets (uint64 each) | records
+
+Each record is ``key \\t page_id \\t title \\n``, sorted by key bytes.
+
+Build it from two tab-separated dumps, plain or gzipped:
+
+    titles:    page_id <TAB> title          (namespace 0 pages, e.g. from page.sql)
+    redirects: from_title <TAB> to_title    (e.g. from redirect.sql joined with page.sql)
+
+    python -m app.services.wikipedia_index --titles titles.tsv.gz \\
+        --redirects redirects.tsv.gz --out data/processed/wiki_titles.idx
+"""
+import argparse
+import gzip
+import mmap
+import re
+import struct
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"WPIDX001"
+HEADER = struct.Struct("<8sQ")
+OFFSET = struct.Struct("<Q")
+
+# Leading phrases that turn a topic into a question
+QUESTION_PREFIX = re.compile(
+    r"^(what|who|where|when|why|how)\s+(is|are|was|were|did|does|do)\s+(an?\s+|the\s+)?"
+    r"|^(tell me about|explain|define|describe|history of|the history of)\s+"
+)
+
+def normalize(title: str) -> str:
+    """Key used for lookups: case-folded, underscores as spaces, collapsed whitespace"""
+    return " ".join(title.replace("_", " ").casefold().split())
+
+
+class TitleIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a title index")
+        self._offsets_start = HEADER.size
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _offset(self, i: int) -> int:
+        return OFFSET.unpack_from(self._map, self._offsets_start + i * OFFSET.size)[0]
+
+    def _key(self, i: int) -> bytes:
+        start = self._offset(i)
+        return self._map[start:self._map.find(b"\t", start)]
+
+    def _record(self, i: int) -> Tuple[str, int, str]:
+        start = self._offset(i)
+        line = self._map[start:self._map.find(b"\n", start)].decode("utf-8")
+        key, page_id, title = line.split("\t", 2)
+        return key, int(page_id), title
+
+    def _lower_bound(self, key: bytes) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, title: str) -> Optional[Tuple[int, str]]:
+        """Exact (normalized) title or redirect lookup; returns (page_id, canonical title)"""
+        key = normalize(title).encode("utf-8")
+        if not key:
+            return None
+        i = self._lower_bound(key)
+        if i < self.count and self._key(i) == key:
+            _, page_id, canonical = self._record(i)
+            return page_id, canonical
+        return None
+
+    def prefix(self, prefix: str, limit: int = 10) -> List[Tuple[str, int, str]]:
+        """Entries whose normalized title starts with ``prefix``, in key order"""
+        key = normalize(prefix).encode("utf-8")
+        matches = []
+        i = self._lower_bound(key)
+        while i < self.count and len(matches) < limit:
+            if not self._key(i).startswith(key):
+                break
+            matches.append(self._record(i))
+            i += 1
+        return matches
+
+    def resolve(self, query: str) -> Optional[Tuple[int, str]]:
+        """Resolve a natural-language query to a page.
+
+        Tries the whole query, then the query without question phrasing, and finally
+        the shortest title that starts with it. Anything else is left to the API
+        search: guessing from single words of the query picks the wrong page.
+        """
+        cleaned = normalize(query).strip(" ?!.")
+        match = self.lookup(cleaned)
+        if match:
+            return match
+
+        topic = QUESTION_PREFIX.sub("", cleaned).strip()
+        if topic != cleaned:
+            match = self.lookup(topic)
+            if match:
+                return match
+
+        if len(topic) >= 4:
+            candidates = self.prefix(topic, limit=20)
+            if candidates:
+                _, page_id, title = min(candidates, key=lambda c: len(c[0]))
+                return page_id, title
+
+        return None
+
+
+def _read_tsv(path: str) -> Iterator[List[str]]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) >= 2:
+                yield parts
+
+
+def build_index(titles_path: str, out_path: str, redirects_path: Optional[str] = None) -> int:
+    """Build an index file from title/redirect dumps; returns the number of keys"""
+    entries: Dict[str, Tuple[int, str, bool]] = {}
+    by_title: Dict[str, int] = {}
+
+    for page_id, title, *_ in _read_tsv(titles_path):
+        if not page_id.isdigit():
+            continue  # header line
+        title = title.replace("_", " ")
+        by_title[title] = int(page_id)
+        key = normalize(title)
+        # Several titles can normalize to the same key; keep the first page seen
+        entries.setdefault(key, (int(page_id), title, False))
+
+    redirects = 0
+    if redirects_path:
+        for source, target, *_ in _read_tsv(redirects_path):
+            target = target.replace("_", " ")
+            page_id = by_title.get(target)
+            if page_id is None:
+                continue
+            key = normalize(source)
+            # Real pages win over redirects that normalize to the same key
+            if key not in entries:
+                entries[key] = (page_id, target, True)
+                redirects += 1
+
+    keys = sorted(k.encode("utf-8") for k in entries if k)
+    records = []
+    for key in keys:
+        page_id, title, _ = entries[key.decode("utf-8")]
+        records.append(key + b"\t" + str(page_id).encode() + b"\t" + title.encode("utf-8") + b"\n")
+
+    offset = HEADER.size + OFFSET.size * len(records)
+    with open(out_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(records)))
+        for record in records:
+            f.write(OFFSET.pack(offset))
+            offset += len(record)
+        for record in records:
+            f.write(record)
+
+    print(f"✅ Indexed {len(records)} titles ({redirects} redirects) into {out_path}")
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline Wikipedia title index")
+    parser.add_argument("--titles", required=True, help="TSV of page_id<TAB>title")
+    parser.add_argument("--redirects", help="TSV of from_title<TAB>to_title")
+    parser.add_argument("--out", required=True, help="Index file to write")
+    args = parser.parse_args()
+    build_index(args.titles, args.out, args.redirects)
+
+
+if __name__ == "__main__":
+    main()
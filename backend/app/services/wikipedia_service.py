@@ -1,7 +1,13 @@
+import os
+import re
 import requests
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 import html
 from ..config import settings
+from ..utils.cache import TTLCache
+from ..utils.text_ranking import BM25
+from ..utils.tracing import tracer
+from .wikipedia_index import TitleIndex
 
 class WikipediaService:
     def __init__(self):
@@ -9,13 +15,58 @@ class WikipediaService:
         self.headers = {
             'User-Agent': 'ResearchAssistant/1.0 (research@example.com)'
         }
+        # Intro extracts keyed by page id, shared by the index and title lookups
+        self.extract_cache = TTLCache(max_entries=1024, ttl=settings.CACHE_TTL)
+        # Full article text for passage retrieval; fewer entries since articles are large
+        self.article_cache = TTLCache(max_entries=128, ttl=settings.CACHE_TTL)
+        # Page ids of queries already answered, so cache-only lookups can find their extract
+        self.query_pages = TTLCache(max_entries=2048, ttl=settings.CACHE_TTL)
+        self.index = None
+        if settings.WIKIPEDIA_INDEX_PATH and os.path.exists(settings.WIKIPEDIA_INDEX_PATH):
+            try:
+                self.index = TitleIndex(settings.WIKIPEDIA_INDEX_PATH)
+                print(f"📇 Wikipedia title index loaded: {self.index.count} titles")
+            except Exception as e:
+                print(f"Wikipedia index error: {e}")
     
-    def search(self, query: str, max_chars: int = 500) -> Optional[Dict]:
+    def search(self, query: str, max_chars: int = 500, cache_only: bool = False) -> Optional[Dict]:
         """Search Wikipedia for information"""
+        # The search fallback calls back into search(), so each retry shows up as a nested span
+        with tracer.span("wikipedia.search", query_length=len(query), cache_only=cache_only) as span:
+            key = " ".join(query.lower().split())
+            if cache_only:
+                result = self._search_cached(key, max_chars)
+            else:
+                result = self._search(query, max_chars)
+                if result:
+                    self.query_pages.set(key, result["metadata"]["page_id"])
+            span.set(found=result is not None)
+            return result
+    
+    def _search_cached(self, key: str, max_chars: int) -> Optional[Dict]:
+        """Answer from the extract cache only, without any request"""
+        page_id = self.query_pages.get(key, allow_stale=True)
+        if page_id is None and self.index:
+            match = self.index.resolve(key)
+            page_id = str(match[0]) if match else None
+        if page_id is None:
+            return None
+        page = self.extract_cache.get(str(page_id), allow_stale=True)
+        return self._format_page(page, max_chars) if page else None
+    
+    def _search(self, query: str, max_chars: int) -> Optional[Dict]:
         try:
             
             clean_query = query.strip()
             
+            # Resolve locally first: one extract request, or none if it is cached
+            if self.index:
+                match = self.index.resolve(clean_query)
+                tracer.current_span().set(index_hit=match is not None)
+                if match:
+                    page = self._fetch_extract(match[0])
+                    if page:
+                        return self._format_page(page, max_chars)
         
             params = {
                 "action": "query",
@@ -27,12 +78,7 @@ class WikipediaService:
                 "inprop": "url"
             }
             
-            response = requests.get(
-                self.base_url, 
-                params=params, 
-                headers=self.headers,
-                timeout=10
-            )
+            response = self._get(params, "extract")
             
             if response.status_code == 200:
                 data = response.json()
@@ -40,22 +86,9 @@ class WikipediaService:
                 
                 for page_id, page_info in pages.items():
                     if page_id != "-1":  
-                        content = page_info.get('extract', '')
-                        if content:
-                            
-                            content = html.unescape(content)
-                            if len(content) > max_chars:
-                                content = content[:max_chars] + "..."
-                            
-                            return {
-                                "title": page_info.get('title', clean_query),
-                                "content": content,
-                                "url": f"https://en.wikipedia.org/?curid={page_id}",
-                                "source_type": "wikipedia",
-                                "metadata": {
-                                    "page_id": page_id
-                                }
-                            }
+                        page = self._cache_page(page_id, page_info)
+                        if page:
+                            return self._format_page(page, max_chars)
             
             #
             search_params = {
@@ -66,12 +99,7 @@ class WikipediaService:
                 "srlimit": 3
             }
             
-            search_response = requests.get(
-                self.base_url, 
-                params=search_params, 
-                headers=self.headers,
-                timeout=10
-            )
+            search_response = self._get(search_params, "search")
             
             if search_response.status_code == 200:
                 search_data = search_response.json()
@@ -86,7 +114,210 @@ class WikipediaService:
             
         except Exception as e:
             print(f"Wikipedia service error: {e}")
+            tracer.current_span().record_error(e)
+            return None
+    
+    def search_passages(self, query: str, max_passages: int = None, passage_chars: int = None) -> List[Dict]:
+        """Return the passages of the best-matching article that are most relevant to the query.
+        
+        The full article is fetched (and cached), split into passages along section and
+        paragraph boundaries, and ranked with BM25. Each passage becomes its own source.
+        """
+        max_passages = max_passages or settings.MAX_PASSAGES
+        passage_chars = passage_chars or settings.PASSAGE_CHARS
+        
+        with tracer.span("wikipedia.passages", query_length=len(query)) as span:
+            try:
+                article = self._fetch_article(query.strip())
+                if not article:
+                    return []
+                
+                passages = self._chunk(article["text"], passage_chars)
+                ranked = []
+                sections = set()
+                # One passage per section, so every source keeps a distinct section URL
+                for i, score in BM25([f"{p['section']} {p['text']}" for p in passages]).top(query, len(passages)):
+                    if passages[i]["section"] not in sections and len(ranked) < max_passages:
+                        sections.add(passages[i]["section"])
+                        ranked.append((i, score))
+                if not ranked:
+                    # Nothing matched the query terms: fall back to the lead section
+                    ranked = [(0, 0.0)]
+                span.set(passages=len(passages), returned=len(ranked))
+                
+                results = []
+                for i, score in ranked:
+                    passage = passages[i]
+                    anchor = f"#{passage['section'].replace(' ', '_')}" if passage["section"] else ""
+                    results.append({
+                        "title": f"{article['title']} — {passage['section']}" if passage["section"] else article["title"],
+                        "content": passage["text"],
+                        "url": f"https://en.wikipedia.org/?curid={article['page_id']}{anchor}",
+                        "source_type": "wikipedia",
+                        "metadata": {
+                            "page_id": article["page_id"],
+                            "section": passage["section"],
+                            "score": round(score, 3)
+                        }
+                    })
+                return results
+            
+            except Exception as e:
+                print(f"Wikipedia passage error: {e}")
+                span.record_error(e)
+                return []
+    
+    def _fetch_article(self, query: str) -> Optional[Dict]:
+        """Full plain-text article for the page the query resolves to"""
+        page_id = None
+        if self.index:
+            match = self.index.resolve(query)
+            if match:
+                page_id = str(match[0])
+        
+        if page_id is None:
+            search_params = {
+                "action": "query",
+                "format": "json",
+                "list": "search",
+                "srsearch": query,
+                "srlimit": 1
+            }
+            search_response = self._get(search_params, "search")
+            if search_response.status_code != 200:
+                return None
+            search_results = search_response.json().get('query', {}).get('search', [])
+            if not search_results:
+                return None
+            page_id = str(search_results[0]['pageid'])
+        
+        cached = self.article_cache.get(page_id)
+        if cached:
+            tracer.current_span().set(article_cache="hit")
+            return cached
+        
+        params = {
+            "action": "query",
+            "format": "json",
+            "prop": "extracts",
+            "explaintext": True,
+            "exsectionformat": "wiki",
+            "pageids": page_id
+        }
+        response = self._get(params, "article")
+        if response.status_code != 200:
+            return None
+        
+        page_info = response.json().get("query", {}).get("pages", {}).get(page_id)
+        if not page_info or not page_info.get("extract"):
+            return None
+        
+        article = {
+            "page_id": page_id,
+            "title": page_info.get("title", query),
+            "text": html.unescape(page_info["extract"])
+        }
+        self.article_cache.set(page_id, article)
+        return article
+    
+    def _chunk(self, text: str, passage_chars: int) -> List[Dict]:
+        """Split article text into passages of roughly passage_chars, never across sections"""
+        passages = []
+        section = ""
+        # exsectionformat=wiki marks headings as "== Heading ==" on their own line
+        for block in re.split(r"\n(?===+ [^\n]+ =+\n)", "\n" + text):
+            heading = re.match(r"\n?(=+) ([^\n]+?) =+\n", block)
+            if heading:
+                section = heading.group(2).strip()
+                block = block[heading.end():]
+            
+            current = ""
+            for paragraph in (p.strip() for p in block.split("\n")):
+                if not paragraph:
+                    continue
+                if current and len(current) + len(paragraph) + 1 > passage_chars:
+                    passages.append({"section": section, "text": current})
+                    current = ""
+                if len(paragraph) > passage_chars:
+                    # Long paragraphs are cut at sentence ends where possible
+                    for sentence in re.split(r"(?<=[.!?]) ", paragraph):
+                        if current and len(current) + len(sentence) + 1 > passage_chars:
+                            passages.append({"section": section, "text": current})
+                            current = ""
+                        current = f"{current} {sentence}".strip()
+                else:
+                    current = f"{current}\n{paragraph}".strip()
+            if current:
+                passages.append({"section": section, "text": current})
+        
+        return passages
+    
+    def _fetch_extract(self, page_id: int) -> Optional[Dict]:
+        """Intro extract for a known page id, from cache or a single request"""
+        cached = self.extract_cache.get(str(page_id))
+        if cached:
+            tracer.current_span().set(extract_cache="hit")
+            return cached
+        
+        params = {
+            "action": "query",
+            "format": "json",
+            "prop": "extracts|info",
+            "exintro": True,
+            "explaintext": True,
+            "pageids": page_id,
+            "inprop": "url"
+        }
+        
+        response = self._get(params, "extract")
+        if response.status_code != 200:
+            return None
+        
+        pages = response.json().get("query", {}).get("pages", {})
+        page_info = pages.get(str(page_id))
+        if not page_info or "missing" in page_info:
             return None
+        return self._cache_page(str(page_id), page_info)
+    
+    def _cache_page(self, page_id: str, page_info: Dict) -> Optional[Dict]:
+        content = page_info.get('extract', '')
+        if not content:
+            return None
+        
+        page = {
+            "page_id": page_id,
+            "title": page_info.get('title', ''),
+            "extract": html.unescape(content)
+        }
+        self.extract_cache.set(page_id, page)
+        return page
+    
+    def _format_page(self, page: Dict, max_chars: int) -> Dict:
+        content = page["extract"]
+        if len(content) > max_chars:
+            content = content[:max_chars] + "..."
+        
+        return {
+            "title": page["title"],
+            "content": content,
+            "url": f"https://en.wikipedia.org/?curid={page['page_id']}",
+            "source_type": "wikipedia",
+            "metadata": {
+                "page_id": page["page_id"]
+            }
+        }
+    
+    def _get(self, params: Dict, kind: str) -> requests.Response:
+        """Issue one API request inside its own span"""
+        with tracer.span("wikipedia.http", kind=kind) as span:
+            response = requests.get(
+                self.base_url, 
+                params=params, 
+                headers=self.headers,
+                timeout=10
+            )
+            span.record_http(response)
+            return response
 
 
 wikipedia_service = WikipediaService()
\ No newline at end of file
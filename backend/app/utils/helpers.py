@@ -8,6 +8,11 @@ def generate_cache_key(query: str, sources: list) -> str:
     data = f"{query}:{','.join(sorted(sources))}"
     return hashlib.md5(data.encode()).hexdigest()
 
+def generate_source_id(source: Dict) -> str:
+    """Stable id for a source, derived from its type and URL"""
+    data = f"{source.get('source_type', 'unknown')}:{source.get('url', '')}"
+    return hashlib.md5(data.encode()).hexdigest()[:16]
+
 def format_duration(seconds: float) -> str:
     """Format duration in a human-readable way"""
     if seconds < 1:
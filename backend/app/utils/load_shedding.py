@@ -0,0 +1,131 @@
+import asyncio
+import math
+import threading
+import time
+from collections import Counter
+from typing import Dict
+from ..config import settings
+
+# Ordered from no degradation to rejecting the request outright
+LEVELS = ["normal", "reduced", "minimal", "cache_only", "reject"]
+
+# Pressure at which each level above "normal" starts
+LEVEL_THRESHOLDS = [0.75, 1.0, 1.25, 1.5]
+
+# Slow providers are not answered by rejecting: latency alone degrades at most to cache_only
+MAX_LATENCY_LEVEL = LEVELS.index("cache_only")
+
+DEPTHS = ["quick", "balanced", "deep"]
+
+class LoadController:
+    """Adaptive load shedding for the research endpoint.
+
+    Pressure is the worst of four ratios: in-flight requests, event-loop lag,
+    recent upstream latency and recent LLM latency, each against its target in
+    settings. Rising pressure first lowers research depth, then the number of
+    sources and answer length, then restricts providers to their caches, and
+    only then rejects. Latency pressure stops at cache-only; only in-flight
+    requests and event-loop lag can reject.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.loop_lag = 0.0
+        self._latency: Dict[str, tuple] = {}
+        self.applied = Counter()
+        self._lock = threading.Lock()
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self):
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+
+    def record_latency(self, kind: str, seconds: float):
+        """Feed an observed upstream ("upstream") or LLM ("llm") latency into its EWMA.
+
+        The average starts from zero, so one slow call (a timeout, say) moves it by a
+        third of its latency rather than setting it outright.
+        """
+        with self._lock:
+            value = 0.7 * self.latency(kind) + 0.3 * seconds
+            self._latency[kind] = (value, time.time())
+
+    def latency(self, kind: str) -> float:
+        """EWMA latency, decayed toward zero when nothing has been observed lately"""
+        value, updated_at = self._latency.get(kind, (0.0, 0.0))
+        return value * math.exp(-(time.time() - updated_at) / settings.LOAD_LATENCY_DECAY)
+
+    async def monitor_event_loop(self, interval: float = 0.25):
+        """Measure how late the loop wakes from sleep; run as a background task"""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            lag = max(loop.time() - started - interval, 0.0)
+            self.loop_lag = 0.8 * self.loop_lag + 0.2 * lag
+
+    @staticmethod
+    def max_in_flight() -> int:
+        """LOAD_MAX_IN_FLIGHT, lowered if needed so reject comes before the REQUEST_LIMIT 429"""
+        return max(min(settings.LOAD_MAX_IN_FLIGHT, int(settings.REQUEST_LIMIT / LEVEL_THRESHOLDS[-1])), 1)
+
+    def signals(self) -> Dict[str, float]:
+        return {
+            "in_flight": self.in_flight / self.max_in_flight(),
+            "loop_lag": self.loop_lag / settings.LOAD_MAX_LOOP_LAG,
+            "upstream_latency": self.latency("upstream") / settings.LOAD_TARGET_UPSTREAM_LATENCY,
+            "llm_latency": self.latency("llm") / settings.LOAD_TARGET_LLM_LATENCY
+        }
+
+    def plan(self, depth: str) -> Dict:
+        """Decide how far to degrade a request arriving now"""
+        signals = self.signals()
+        pressure = max(signals.values())
+        load_pressure = max(signals["in_flight"], signals["loop_lag"])
+        latency_pressure = max(signals["upstream_latency"], signals["llm_latency"])
+        level = max(
+            self._level(load_pressure),
+            min(self._level(latency_pressure), MAX_LATENCY_LEVEL)
+        )
+
+        applied_depth = DEPTHS[max(DEPTHS.index(depth) - level, 0)] if level < 4 else depth
+        plan = {
+            "level": LEVELS[level],
+            "pressure": round(pressure, 2),
+            "cause": max(signals, key=signals.get),
+            "requested_depth": depth,
+            "depth": applied_depth,
+            "max_sources": None,
+            "max_tokens": None,
+            "cache_only": False
+        }
+        if level >= 2:
+            plan["max_sources"] = 3
+            plan["max_tokens"] = settings.MAX_TOKENS // 2
+        if level >= 3:
+            plan["max_sources"] = 2
+            plan["max_tokens"] = settings.MAX_TOKENS // 3
+            plan["cache_only"] = True
+
+        self.applied[plan["level"]] += 1
+        return plan
+
+    @staticmethod
+    def _level(pressure: float) -> int:
+        return sum(1 for threshold in LEVEL_THRESHOLDS if pressure >= threshold)
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": self.in_flight,
+            "loop_lag_ms": round(self.loop_lag * 1000, 1),
+            "upstream_latency": round(self.latency("upstream"), 2),
+            "llm_latency": round(self.latency("llm"), 2),
+            "pressure": round(max(self.signals().values()), 2),
+            "degradations": dict(self.applied)
+        }
+
+
+load_controller = LoadController()
@@ -0,0 +1,193 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from ..config import settings
+
+# Innermost Python frames of an event loop that is idle, waiting for I/O.
+# With uvloop the wait happens in C, so the innermost frame is asyncio's runner.
+LOOP_IDLE_FRAMES = (
+    "select (selectors.py:",
+    "run_forever (base_events.py:",
+    "run_until_complete (base_events.py:",
+    "run (runners.py:"
+)
+
+# Idle asyncio.to_thread workers block on their queue in C inside this frame
+IDLE_WORKER_FRAME = "_worker (thread.py:"
+
+MAX_STACK_DEPTH = 64
+
+class SamplingProfiler:
+    """Low-overhead wall-clock sampler built on ``sys._current_frames``.
+
+    A background thread snapshots every thread's stack at a fixed interval and
+    aggregates them as collapsed stacks (``thread;outer;...;inner count``), the
+    input format of flamegraph.pl and speedscope. Either a time window is
+    profiled, or the next N research requests (one-off or session turns), in
+    which case samples are only taken while one of them is in flight.
+    """
+
+    def __init__(self, max_seconds: float):
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Bumped by every start, so requests begun under an earlier profile are not counted
+        self._profile_id = 0
+        self._reset()
+
+    def _reset(self):
+        self.stacks = Counter()
+        self.samples = 0
+        self.loop_samples = 0
+        self.loop_busy_samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self.interval = 0.005
+        self.deadline = None
+        self.requests_target = None
+        self.requests_done = 0
+        self.in_flight = 0
+        self.loop_thread_id = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: Optional[float] = None, requests: Optional[int] = None,
+              interval: float = 0.005, loop_thread_id: Optional[int] = None) -> Dict:
+        """Begin a profile; raises RuntimeError if one is already running"""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("A profile is already running")
+            self._reset()
+            self._profile_id += 1
+            self.interval = max(interval, 0.001)
+            self.requests_target = requests
+            self.loop_thread_id = loop_thread_id
+            self.started_at = time.time()
+            self.deadline = self.started_at + min(duration or self.max_seconds, self.max_seconds)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+            self._thread.start()
+        return self.status()
+
+    def stop(self) -> Dict:
+        """Stop sampling and wait up to a second for the sampler thread to exit"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+        return self.status()
+
+    def request_started(self) -> Optional[int]:
+        """Called by the research and session endpoints; a no-op unless profiling requests.
+
+        Returns a token to pass to ``request_finished``, or None if the request is not profiled.
+        """
+        if self.requests_target and self.running:
+            with self._lock:
+                self.in_flight += 1
+                return self._profile_id
+        return None
+
+    def request_finished(self, token: Optional[int]):
+        # Only requests that started under the current profile count toward it
+        if token is None:
+            return
+        with self._lock:
+            if token != self._profile_id or not self.requests_target:
+                return
+            self.in_flight = max(self.in_flight - 1, 0)
+            self.requests_done += 1
+            if self.requests_done >= self.requests_target:
+                self._stop.set()
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while not self._stop.is_set() and time.time() < self.deadline:
+            if not self.requests_target or self.in_flight > 0:
+                self._sample(own_id)
+            self._stop.wait(self.interval)
+        self.stopped_at = time.time()
+
+    def _sample(self, own_id: int):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        frames = sys._current_frames()
+        with self._lock:
+            self.samples += 1
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    filename = os.path.basename(code.co_filename)
+                    stack.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.reverse()
+                if stack and stack[-1].startswith(IDLE_WORKER_FRAME):
+                    continue
+                thread_name = names.get(thread_id, f"thread-{thread_id}")
+                self.stacks[";".join([thread_name] + stack)] += 1
+
+                if thread_id == self.loop_thread_id and stack:
+                    self.loop_samples += 1
+                    if not stack[-1].startswith(LOOP_IDLE_FRAMES):
+                        self.loop_busy_samples += 1
+
+    def status(self) -> Dict:
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "elapsed_seconds": round((self.stopped_at or time.time()) - self.started_at, 2) if self.started_at else 0,
+            "interval_ms": round(self.interval * 1000, 1),
+            "samples": self.samples,
+            "requests_target": self.requests_target,
+            "requests_profiled": self.requests_done
+        }
+
+    def collapsed(self) -> str:
+        """Collapsed-stack text for flamegraph.pl / speedscope"""
+        with self._lock:
+            return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 25) -> List[Dict]:
+        """Functions ranked by self samples, with inclusive counts"""
+        self_counts = Counter()
+        total_counts = Counter()
+        with self._lock:
+            for stack, count in self.stacks.items():
+                frames = stack.split(";")[1:]
+                if not frames:
+                    continue
+                self_counts[frames[-1]] += count
+                for frame in set(frames):
+                    total_counts[frame] += count
+            samples = self.samples or 1
+
+        return [
+            {
+                "function": function,
+                "self_samples": count,
+                "total_samples": total_counts[function],
+                "self_pct": round(100 * count / samples, 1)
+            }
+            for function, count in self_counts.most_common(limit)
+        ]
+
+    def report(self, limit: int = 25) -> Dict:
+        loop_busy = None
+        if self.loop_samples:
+            loop_busy = round(100 * self.loop_busy_samples / self.loop_samples, 1)
+        return {
+            **self.status(),
+            "event_loop_busy_pct": loop_busy,
+            "top_functions": self.top_functions(limit),
+            "collapsed": self.collapsed()
+        }
+
+
+profiler = SamplingProfiler(max_seconds=settings.PROFILING_MAX_SECONDS)
@@ -0,0 +1,69 @@
+import math
+import re
+from collections import Counter
+from typing import List, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "to", "for", "and", "or", "is", "are", "was",
+    "were", "be", "by", "with", "as", "it", "its", "that", "this", "from", "what", "who",
+    "when", "where", "why", "how", "did", "does", "do", "which", "about"
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def term_coverage(query: str, text: str) -> float:
+    """Share of the query's terms that appear in the text, from 0 to 1"""
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return 0.0
+    return len(query_terms & set(tokenize(text))) / len(query_terms)
+
+
+class BM25:
+    """Okapi BM25 over a small in-memory collection.
+
+    Documents are tokenized once; scoring a query only walks the query terms
+    present in each document's term counts.
+    """
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_terms = [Counter(tokenize(doc)) for doc in documents]
+        self.doc_lengths = [sum(terms.values()) for terms in self.doc_terms]
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if documents else 0
+        self.doc_freq = Counter()
+        for terms in self.doc_terms:
+            self.doc_freq.update(terms.keys())
+
+    def idf(self, term: str) -> float:
+        n = len(self.doc_terms)
+        df = self.doc_freq.get(term, 0)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def scores(self, query: str) -> List[float]:
+        query_terms = set(tokenize(query))
+        weights = {t: self.idf(t) for t in query_terms if t in self.doc_freq}
+        if not weights or not self.avg_length:
+            return [0.0] * len(self.doc_terms)
+
+        results = []
+        for terms, length in zip(self.doc_terms, self.doc_lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length)
+            score = 0.0
+            for term, idf in weights.items():
+                tf = terms.get(term)
+                if tf:
+                    score += idf * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+    def top(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Indices and scores of the k best-matching documents with a non-zero score"""
+        ranked = sorted(enumerate(self.scores(query)), key=lambda item: -item[1])
+        return [(i, score) for i, score in ranked[:k] if score > 0]
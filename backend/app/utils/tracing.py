@@ -0,0 +1,208 @@
+import json
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import requests
+from ..config import settings
+
+# asyncio.to_thread and create_task copy the context, so spans opened in
+# provider threads and pipelined tasks find their parent automatically.
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+# OTLP ids are lowercase hex: 32 characters for a trace, 16 for a span
+_TRACE_ID_RE = re.compile(r"[0-9a-f]{32}")
+_SPAN_ID_RE = re.compile(r"[0-9a-f]{16}")
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent: Optional["Span"], sampled: bool,
+                 parent_span_id: Optional[str] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        # A root span links to the caller's span when the request carried a traceparent
+        self.parent_id = parent.span_id if parent else parent_span_id
+        self.sampled = sampled
+        self.attributes: Dict[str, Any] = {}
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start = time.time()
+        self.end: Optional[float] = None
+        # Spans of one trace share the root's buffer until the root ends
+        self.trace: Dict[str, Any] = parent.trace if parent else {"spans": [], "exported": False}
+
+    def set(self, **attributes):
+        """Attach attributes (timings, sizes, counts) to the span"""
+        if self.sampled:
+            self.attributes.update(attributes)
+
+    def record_error(self, error: Any):
+        """Mark the span failed without raising"""
+        self.status = "error"
+        self.error = str(error)[:200]
+
+    def record_http(self, response: requests.Response):
+        """Record status and payload size of an upstream response"""
+        self.set(status_code=response.status_code, response_bytes=len(response.content or b""))
+        if response.status_code >= 400:
+            self.record_error(f"HTTP {response.status_code}")
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.time()) - self.start
+
+    def to_otlp(self) -> Dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(int(self.start * 1e9)),
+            "endTimeUnixNano": str(int((self.end or time.time()) * 1e9)),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.status == "error" else {"code": 1}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": value if isinstance(value, str) else json.dumps(value, default=str)}
+    return {"key": key, "value": typed}
+
+
+class Tracer:
+    """Per-request tracing with head sampling and OTLP/JSON export.
+
+    Finished traces are written as OTLP/JSON lines to TRACE_EXPORT_PATH and/or
+    POSTed to ``TRACE_OTLP_ENDPOINT/v1/traces`` from a background thread, so
+    exporting never blocks a request.
+    """
+
+    def __init__(self, sample_rate: float, export_path: Optional[str], otlp_endpoint: Optional[str]):
+        self.sample_rate = sample_rate
+        self.export_path = export_path
+        self.otlp_endpoint = otlp_endpoint.rstrip("/") if otlp_endpoint else None
+        self._queue = queue.Queue(maxsize=1000)
+        self._worker = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 and bool(self.export_path or self.otlp_endpoint)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, parent_span_id: Optional[str] = None,
+             **attributes):
+        """Open a span as a child of the current one, or start a new trace"""
+        parent = _current_span.get()
+        if parent:
+            span = Span(name, parent.trace_id, parent, parent.sampled)
+        else:
+            sampled = self.enabled and random.random() < self.sample_rate
+            span = Span(name, trace_id or uuid.uuid4().hex, None, sampled, parent_span_id)
+        span.set(**attributes)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.record_error(e)
+            raise
+        finally:
+            span.end = time.time()
+            span.set(duration_ms=round(span.duration * 1000, 1))
+            _current_span.reset(token)
+            if span.sampled:
+                self._finish(span, is_root=parent is None)
+
+    def _finish(self, span: Span, is_root: bool):
+        trace = span.trace
+        if trace["exported"]:
+            # Late span (e.g. a provider still running after the response): export alone
+            self._enqueue([span])
+            return
+        trace["spans"].append(span)
+        if is_root:
+            trace["exported"] = True
+            self._enqueue(trace["spans"])
+
+    def _enqueue(self, spans: List[Span]):
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", "research-assistant")]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.utils.tracing"},
+                    "spans": [s.to_otlp() for s in spans]
+                }]
+            }]
+        }
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            print("Tracing: export queue full, dropping trace")
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+                self._worker.start()
+
+    def _export_loop(self):
+        while True:
+            payload = self._queue.get()
+            if self.export_path:
+                try:
+                    with open(self.export_path, "a") as f:
+                        f.write(json.dumps(payload) + "\n")
+                except Exception as e:
+                    print(f"Tracing file export error: {e}")
+            if self.otlp_endpoint:
+                try:
+                    requests.post(f"{self.otlp_endpoint}/v1/traces", json=payload, timeout=5)
+                except Exception as e:
+                    print(f"Tracing OTLP export error: {e}")
+
+
+def _valid_id(value: str, pattern: re.Pattern) -> bool:
+    # All-zero ids are invalid in W3C trace context and OTLP
+    return bool(pattern.fullmatch(value)) and value.strip("0") != ""
+
+
+def trace_context_from_headers(headers) -> Dict[str, str]:
+    """Span arguments that continue the caller's trace (W3C traceparent or X-Trace-Id).
+
+    Only non-zero 32-hex trace ids are reused, as OTLP requires. Any other
+    X-Trace-Id starts a new trace and is kept as its ``caller_trace_id`` attribute.
+    """
+    traceparent = headers.get("traceparent")
+    if traceparent:
+        parts = traceparent.strip().lower().split("-")
+        if len(parts) == 4 and _valid_id(parts[1], _TRACE_ID_RE) and _valid_id(parts[2], _SPAN_ID_RE):
+            return {"trace_id": parts[1], "parent_span_id": parts[2]}
+    trace_id = headers.get("x-trace-id")
+    if trace_id:
+        if _valid_id(trace_id.strip().lower(), _TRACE_ID_RE):
+            return {"trace_id": trace_id.strip().lower()}
+        return {"caller_trace_id": trace_id[:64]}
+    return {}
+
+
+tracer = Tracer(settings.TRACE_SAMPLE_RATE, settings.TRACE_EXPORT_PATH, settings.TRACE_OTLP_ENDPOINT)
@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+# The application package lives in backend/ and is imported as `app`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# The OpenAI client refuses to construct without a key; tests never call it
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
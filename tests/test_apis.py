@@ -0,0 +1,273 @@
+import threading
+import time
+
+import pytest
+
+from app.config import settings
+from app.services.news_service import NewsService
+
+
+def make_article(topic, i):
+    return {
+        "title": f"{topic} story {i}",
+        "content": f"about {topic}",
+        "url": f"https://news.example/{topic}/{i}",
+        "source_type": "news",
+        "metadata": {}
+    }
+
+
+@pytest.fixture
+def news(monkeypatch):
+    monkeypatch.setattr(settings, "NEWS_BATCH_WINDOW", 0.05)
+    service = NewsService()
+    service.api_key = "test-key"
+    return service
+
+
+def search_concurrently(service, queries):
+    results = {}
+
+    def run(q):
+        results[q] = service.search(q, max_results=2)
+
+    threads = [threading.Thread(target=run, args=(q,)) for q in queries]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_queries_share_one_upstream_call(news, monkeypatch):
+    calls = []
+
+    def fake_request(q, page_size):
+        calls.append(q)
+        return [make_article(topic, i) for topic in ("bitcoin", "climate") for i in range(2)]
+
+    monkeypatch.setattr(news, "_request", fake_request)
+    results = search_concurrently(news, ["bitcoin price", "climate change"])
+
+    assert len(calls) == 1
+    assert sorted(calls[0].split(" OR ")) == ["(bitcoin price)", "(climate change)"]
+    assert all("bitcoin" in a["url"] for a in results["bitcoin price"])
+    assert all("climate" in a["url"] for a in results["climate change"])
+
+
+def test_timed_out_waiters_do_not_stall_later_searches(news, monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_TIMEOUT", 0.3)
+    monkeypatch.setattr(settings, "NEWS_BATCH_MAX_QUERIES", 1)
+    calls = []
+
+    def slow_request(q, page_size):
+        calls.append(q)
+        time.sleep(0.2)
+        return [make_article(q.split()[0], 0)]
+
+    monkeypatch.setattr(news, "_request", slow_request)
+    # One query per batch, so the later waiters time out before their turn
+    search_concurrently(news, ["alpha one", "beta two", "gamma three", "delta four"])
+
+    deadline = time.time() + 2
+    while news._leader_active and time.time() < deadline:
+        time.sleep(0.05)
+    assert not news._leader_active
+    assert news._pending == []
+
+    calls.clear()
+    assert news.search("fresh query", max_results=2)
+    assert calls == ["fresh query"]
+
+
+def build_title_index(tmp_path):
+    from app.services.wikipedia_index import TitleIndex, build_index
+
+    titles = tmp_path / "titles.tsv"
+    titles.write_text(
+        "page_id\ttitle\n"
+        "1\tBenefit\n"
+        "2\tMeditation\n"
+        "3\tArtificial_intelligence\n"
+        "4\tPython_(programming_language)\n"
+    )
+    redirects = tmp_path / "redirects.tsv"
+    redirects.write_text("AI\tArtificial_intelligence\n")
+    out = tmp_path / "titles.idx"
+    build_index(str(titles), str(out), str(redirects))
+    return TitleIndex(str(out))
+
+
+def test_title_index_resolves_titles_redirects_and_prefixes(tmp_path):
+    index = build_title_index(tmp_path)
+
+    assert index.resolve("Meditation") == (2, "Meditation")
+    assert index.resolve("What is AI?") == (3, "Artificial intelligence")
+    assert index.resolve("python (prog") == (4, "Python (programming language)")
+
+
+def test_title_index_does_not_guess_from_single_words(tmp_path):
+    index = build_title_index(tmp_path)
+
+    # Left to the API search rather than resolved to "Benefit"
+    assert index.resolve("benefits of meditation") is None
+
+
+def test_latency_alone_never_rejects():
+    from app.utils.load_shedding import LoadController
+
+    controller = LoadController()
+    # One request timing out must not shed everything that follows
+    controller.record_latency("upstream", 15.0)
+    assert controller.plan("deep")["level"] == "reduced"
+
+    for _ in range(20):
+        controller.record_latency("upstream", 60.0)
+        controller.record_latency("llm", 120.0)
+    assert controller.plan("deep")["level"] == "cache_only"
+
+    controller.in_flight = settings.LOAD_MAX_IN_FLIGHT * 2
+    assert controller.plan("deep")["level"] == "reject"
+
+
+def test_queries_left_empty_by_demultiplexing_are_sent_alone(news, monkeypatch):
+    calls = []
+
+    def fake_request(q, page_size):
+        calls.append(q)
+        if " OR " in q:
+            return [make_article("bitcoin", i) for i in range(2)]
+        return [make_article("ai", 0)]
+
+    monkeypatch.setattr(news, "_request", fake_request)
+    # "What is AI?" has no terms long enough to match articles of a combined response
+    results = search_concurrently(news, ["What is AI?", "bitcoin price"])
+
+    assert results["What is AI?"] == [make_article("ai", 0)]
+    assert all("bitcoin" in a["url"] for a in results["bitcoin price"])
+    assert calls[1:] == ["What is AI?"]
+
+    calls.clear()
+    assert news.search("What is AI?") == [make_article("ai", 0)]
+    assert calls == []
+
+
+def test_trace_context_only_reuses_valid_otlp_ids():
+    from app.utils.tracing import trace_context_from_headers
+
+    traceparent = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    assert trace_context_from_headers({"traceparent": traceparent}) == {
+        "trace_id": "4bf92f3577b34da6a3ce929d0e0e4736",
+        "parent_span_id": "00f067aa0ba902b7"
+    }
+    assert trace_context_from_headers({"x-trace-id": "4BF92F3577B34DA6A3CE929D0E0E4736"}) == {
+        "trace_id": "4bf92f3577b34da6a3ce929d0e0e4736"
+    }
+    assert trace_context_from_headers({"x-trace-id": "my-request-42"}) == {"caller_trace_id": "my-request-42"}
+    assert trace_context_from_headers({"x-trace-id": "0" * 32}) == {"caller_trace_id": "0" * 32}
+    assert trace_context_from_headers({"traceparent": "00-" + "z" * 32 + "-00f067aa0ba902b7-01"}) == {}
+
+
+def test_root_span_links_to_the_callers_span():
+    from app.utils.tracing import Tracer
+
+    tracer = Tracer(1.0, None, None)
+    with tracer.span("root", trace_id="4bf92f3577b34da6a3ce929d0e0e4736", parent_span_id="00f067aa0ba902b7") as root:
+        with tracer.span("child") as child:
+            pass
+
+    assert root.to_otlp()["parentSpanId"] == "00f067aa0ba902b7"
+    assert child.to_otlp()["parentSpanId"] == root.span_id
+    assert child.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+
+
+def test_profile_ignores_requests_started_before_it():
+    from app.utils.profiler import SamplingProfiler
+
+    profiler = SamplingProfiler(max_seconds=5)
+    earlier = profiler.request_started()
+    profiler.start(requests=1, interval=0.001)
+
+    profiler.request_finished(earlier)
+    assert profiler.running
+    assert profiler.requests_done == 0
+
+    token = profiler.request_started()
+    time.sleep(0.05)
+    profiler.request_finished(token)
+    status = profiler.stop()
+
+    assert status["requests_profiled"] == 1
+    assert status["samples"] > 0
+
+
+ARTICLE = (
+    "Qubits are the lead topic.\n"
+    "\n"
+    "== History ==\n"
+    "Early qubits were built in 1998. " + "Qubits history continues here. " * 6 + "\n"
+    "Another paragraph about qubits history.\n"
+    "\n"
+    "== Applications ==\n"
+    "Cryptography uses qubits.\n"
+)
+
+
+@pytest.fixture
+def wikipedia(monkeypatch):
+    from app.services.wikipedia_service import WikipediaService
+
+    service = WikipediaService()
+    service.index = None
+    monkeypatch.setattr(service, "_fetch_article", lambda query: {
+        "page_id": "42", "title": "Qubit", "text": ARTICLE
+    })
+    return service
+
+
+def test_chunk_splits_sections_and_long_paragraphs(wikipedia):
+    passages = wikipedia._chunk(ARTICLE, passage_chars=80)
+
+    assert [p["section"] for p in passages][0] == ""
+    assert passages[0]["text"] == "Qubits are the lead topic."
+    history = [p for p in passages if p["section"] == "History"]
+    # The long paragraph is cut at sentence ends into several passages
+    assert len(history) > 2
+    assert all(len(p["text"]) <= 80 for p in history)
+    assert all(p["text"].endswith(".") for p in history)
+    assert [p["text"] for p in passages if p["section"] == "Applications"] == ["Cryptography uses qubits."]
+
+
+def test_passages_keep_one_per_section(wikipedia):
+    results = wikipedia.search_passages("qubits history", max_passages=3, passage_chars=80)
+
+    sections = [r["metadata"]["section"] for r in results]
+    assert sections[0] == "History"
+    assert len(sections) == len(set(sections)) == 3
+    assert results[0]["url"] == "https://en.wikipedia.org/?curid=42#History"
+    assert results[0]["title"] == "Qubit — History"
+
+
+def test_passages_fall_back_to_the_lead_section(wikipedia):
+    results = wikipedia.search_passages("volcano", passage_chars=80)
+
+    assert len(results) == 1
+    assert results[0]["content"] == "Qubits are the lead topic."
+    assert results[0]["url"] == "https://en.wikipedia.org/?curid=42"
+    assert results[0]["metadata"]["score"] == 0.0
+
+
+def test_bm25_ranks_by_term_weight_and_drops_non_matches():
+    from app.utils.text_ranking import BM25
+
+    bm25 = BM25([
+        "the stock market fell",
+        "volcano eruption in iceland",
+        "volcano volcano ash over iceland",
+        "iceland travel guide"
+    ])
+    ranked = bm25.top("iceland volcano", 4)
+
+    assert [i for i, _ in ranked] == [2, 1, 3]
+    assert ranked[0][1] > ranked[1][1] > ranked[2][1] > 0
+    assert bm25.top("what is it", 4) == []
@@ -0,0 +1,242 @@
+import asyncio
+import time
+
+import pytest
+
+from app.config import settings
+from app.services import research_service as research_module
+from app.services.research_service import research_service
+
+
+def test_speculative_restart_reports_both_generations(monkeypatch):
+    def wiki(query, cache_only=False):
+        time.sleep(0.1)
+        return {"title": "W", "content": "c", "url": "https://w", "source_type": "wikipedia"}
+
+    def news(query, max_results=2, cache_only=False):
+        time.sleep(0.5)
+        return [{"title": "Quantum news", "content": "c", "url": "https://n", "source_type": "news"}]
+
+    def generate(query, sources, max_tokens=None):
+        time.sleep(0.2)
+        return {"answer": f"{len(sources)} sources", "tokens_used": 7}
+
+    monkeypatch.setattr(research_module.wikipedia_service, "search", wiki)
+    monkeypatch.setattr(research_module.news_service, "search", news)
+    monkeypatch.setattr(research_module.ai_service, "generate_answer", generate)
+    monkeypatch.setattr(settings, "PIPELINE_MIN_SOURCES", 1)
+
+    result = asyncio.run(research_service.research("quantum", pipelined=True, speculative=True))
+    pipeline = result.pipeline
+
+    assert result.answer == "2 sources"
+    assert pipeline["restarted"]
+    # The first generation ran 0.1s-0.3s while news was still fetching
+    assert 0.15 <= pipeline["overlapped_seconds"] <= 0.3
+    assert pipeline["generation_started_after"] < pipeline["final_generation_started_after"]
+    assert pipeline["discarded_generation"]["finished"]
+    assert pipeline["discarded_generation"]["tokens_used"] == 7
+
+
+def test_session_turns_follow_the_load_shedding_plan(monkeypatch):
+    from fastapi import HTTPException
+    from app.routes import sessions
+    from app.schemas.request import SessionQuery
+    from app.services.session_service import session_service
+    from app.utils.load_shedding import load_controller
+
+    fetched = []
+
+    def wiki(query, cache_only=False):
+        fetched.append(cache_only)
+        return {"title": "W", "content": "c", "url": "https://w", "source_type": "wikipedia"}
+
+    def generate(query, sources, max_tokens=None, history=None):
+        return {"answer": f"max_tokens={max_tokens}", "tokens_used": 7}
+
+    monkeypatch.setattr(research_module.wikipedia_service, "search", wiki)
+    monkeypatch.setattr(research_module.ai_service, "generate_answer", generate)
+    session = session_service.create()
+    request = SessionQuery(query="quantum computing", depth="quick")
+
+    # Slow providers degrade the turn to the cache without rejecting it
+    # A fresh latency table, so what this turn records does not leak into later tests
+    monkeypatch.setattr(load_controller, "_latency", {"upstream": (100.0, time.time())})
+    result = asyncio.run(sessions.session_research(session["id"], request))
+    assert fetched == [True]
+    assert result.degradation["level"] == "cache_only"
+    assert result.answer == f"max_tokens={settings.MAX_TOKENS // 3}"
+
+    monkeypatch.setattr(load_controller, "in_flight", settings.LOAD_MAX_IN_FLIGHT * 2)
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(sessions.session_research(session["id"], request))
+    assert rejected.value.status_code == 503
+    assert len(session_service.get(session["id"])["turns"]) == 1
+
+
+def test_profiling_requests_counts_session_turns(monkeypatch):
+    from app.routes import debug, sessions
+    from app.schemas.request import SessionQuery
+    from app.services.session_service import session_service
+    from app.utils.profiler import profiler
+
+    def wiki(query, cache_only=False):
+        time.sleep(0.05)
+        return {"title": "W", "content": "c", "url": "https://w", "source_type": "wikipedia"}
+
+    def generate(query, sources, max_tokens=None, history=None):
+        return {"answer": "a", "tokens_used": 7}
+
+    monkeypatch.setattr(research_module.wikipedia_service, "search", wiki)
+    monkeypatch.setattr(research_module.ai_service, "generate_answer", generate)
+    session = session_service.create()
+
+    profiler.start(requests=1, interval=0.001)
+    asyncio.run(sessions.session_research(session["id"], SessionQuery(query="quantum computing", depth="quick")))
+    status = asyncio.run(debug.stop_profile())
+
+    assert not status["running"]
+    assert status["requests_profiled"] == 1
+    assert status["samples"] > 0
+
+
+def test_pipelined_generation_waits_past_the_deadline_for_a_first_source(monkeypatch):
+    def wiki(query, cache_only=False):
+        time.sleep(0.3)
+        return {"title": "W", "content": "c", "url": "https://w", "source_type": "wikipedia"}
+
+    def generate(query, sources, max_tokens=None):
+        return {"answer": f"{len(sources)} sources", "tokens_used": 7}
+
+    monkeypatch.setattr(research_module.wikipedia_service, "search", wiki)
+    monkeypatch.setattr(research_module.ai_service, "generate_answer", generate)
+    monkeypatch.setattr(settings, "PIPELINE_SOURCE_DEADLINE", 0.1)
+
+    result = asyncio.run(research_service.research("x", include_sources=["wikipedia"], pipelined=True))
+
+    assert result.answer == "1 sources"
+    assert result.pipeline["providers_awaited"] == ["wikipedia"]
+    assert result.pipeline["generation_started_after"] >= 0.3
+
+
+def test_speculative_mode_keeps_the_answer_when_late_sources_rank_low(monkeypatch):
+    def wiki(query, cache_only=False):
+        return {"title": "Quantum computing", "content": "qubits", "url": "https://w", "source_type": "wikipedia"}
+
+    def news(query, max_results=2, cache_only=False):
+        time.sleep(0.3)
+        return [{"title": "Markets", "content": "stocks", "url": "https://n", "source_type": "news"}]
+
+    calls = []
+
+    def generate(query, sources, max_tokens=None):
+        calls.append(len(sources))
+        return {"answer": f"{len(sources)} sources", "tokens_used": 7}
+
+    monkeypatch.setattr(research_module.wikipedia_service, "search", wiki)
+    monkeypatch.setattr(research_module.news_service, "search", news)
+    monkeypatch.setattr(research_module.ai_service, "generate_answer", generate)
+    monkeypatch.setattr(settings, "PIPELINE_SOURCE_DEADLINE", 0.05)
+
+    result = asyncio.run(research_service.research("quantum computing", pipelined=True, speculative=True))
+
+    assert calls == [1]
+    assert not result.pipeline["restarted"]
+    assert [s.url for s in result.sources] == ["https://w"]
+
+
+def test_in_flight_load_is_shed_with_503_before_the_rate_limit(monkeypatch):
+    from fastapi import BackgroundTasks, HTTPException, Request, Response
+    from app.routes import research
+    from app.schemas.request import ResearchRequest
+    from app.utils.load_shedding import load_controller
+
+    def call_endpoint():
+        http_request = Request({"type": "http", "headers": []})
+        return asyncio.run(research.research_endpoint(
+            ResearchRequest(query="quantum computing"), BackgroundTasks(), http_request, Response()
+        ))
+
+    # Requests already running, short of REQUEST_LIMIT
+    running = settings.REQUEST_LIMIT - 2
+    monkeypatch.setattr(load_controller, "in_flight", running)
+    monkeypatch.setitem(research.active_requests, "demo", running)
+
+    with pytest.raises(HTTPException) as rejected:
+        call_endpoint()
+    assert rejected.value.status_code == 503
+    assert rejected.value.headers["Retry-After"] == "5"
+    assert load_controller.in_flight == running
+    assert research.active_requests["demo"] == running
+
+
+@pytest.fixture
+def research_route(monkeypatch):
+    import json
+    from fastapi import BackgroundTasks, Request, Response
+    from app.routes import research
+    from app.schemas.request import ResearchRequest
+
+    def wiki(query, cache_only=False):
+        return {"title": "W", "content": "full wiki text", "url": "https://w", "source_type": "wikipedia",
+                "metadata": {"page_id": "1"}}
+
+    def news(query, max_results=2, cache_only=False):
+        return [{"title": "N", "content": "full news text", "url": "https://n", "source_type": "news"}]
+
+    def generate(query, sources, max_tokens=None):
+        return {"answer": "answer", "tokens_used": 7}
+
+    monkeypatch.setattr(research_module.wikipedia_service, "search", wiki)
+    monkeypatch.setattr(research_module.news_service, "search", news)
+    monkeypatch.setattr(research_module.ai_service, "generate_answer", generate)
+
+    def call(**body):
+        result = asyncio.run(research.research_endpoint(
+            ResearchRequest(query="quantum computing", **body), BackgroundTasks(),
+            Request({"type": "http", "headers": []}), Response()
+        ))
+        return result if not hasattr(result, "body") else json.loads(result.body)
+
+    return call
+
+
+def test_response_views_and_fields(research_route):
+    citations = research_route(view="citations")
+    assert [s["title"] for s in citations["sources"]] == ["W", "N"]
+    assert all(set(s) == {"id", "title", "url", "source_type"} for s in citations["sources"])
+    assert citations["answer"] == "answer"
+
+    answer_only = research_route(view="answer")
+    assert "sources" not in answer_only
+    assert answer_only["answer"] == "answer"
+
+    assert research_route(fields=["answer", "tokens_used"]) == {"answer": "answer", "tokens_used": 7}
+    assert research_route(view="citations", fields=["sources"]) == {"sources": citations["sources"]}
+
+
+def test_unknown_response_fields_are_rejected(research_route):
+    from fastapi import HTTPException
+
+    with pytest.raises(HTTPException) as rejected:
+        research_route(fields=["answer", "secret"])
+    assert rejected.value.status_code == 400
+    assert "secret" in rejected.value.detail
+
+
+def test_source_ids_round_trip_through_the_sources_endpoint(research_route):
+    from fastapi import HTTPException
+    from app.routes import research
+
+    citations = research_route(view="citations")
+    by_title = {s["title"]: s["id"] for s in citations["sources"]}
+
+    source = asyncio.run(research.get_source(by_title["W"]))
+    assert source.id == by_title["W"]
+    assert source.content == "full wiki text"
+    assert source.metadata == {"page_id": "1"}
+    assert asyncio.run(research.get_source(by_title["N"])).content == "full news text"
+
+    with pytest.raises(HTTPException) as missing:
+        asyncio.run(research.get_source("0" * 16))
+    assert missing.value.status_code == 404